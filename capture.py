@@ -0,0 +1,216 @@
+import ctypes
+import ctypes.util
+import glob
+import logging
+import os
+import sys
+import numpy as np
+import cv2 as cv
+import pyautogui
+
+
+class CaptureBackend:
+    """Interface of screen capture used by my_pygui.frame_cache.
+    grab returns screen, or its region (x, y, w, h), as BGR numpy array (may be a view on backend's buffer)"""
+    def size(self):
+        raise NotImplementedError
+
+    def grab(self, region=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    """pyautogui.screenshot - works everywhere, but converts image several times"""
+    def size(self):
+        return tuple(pyautogui.size())
+
+    def grab(self, region=None):
+        image = pyautogui.screenshot(region=tuple(region) if region else None)
+        return cv.cvtColor(np.array(image), cv.COLOR_RGB2BGR)
+
+
+class _XImage(ctypes.Structure):
+    """beginning of Xlib XImage structure (only fields used here)"""
+    _fields_ = [('width', ctypes.c_int),
+                ('height', ctypes.c_int),
+                ('xoffset', ctypes.c_int),
+                ('format', ctypes.c_int),
+                ('data', ctypes.c_void_p),
+                ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int),
+                ('bitmap_bit_order', ctypes.c_int),
+                ('bitmap_pad', ctypes.c_int),
+                ('depth', ctypes.c_int),
+                ('bytes_per_line', ctypes.c_int),
+                ('bits_per_pixel', ctypes.c_int)]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong),
+                ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p),
+                ('readOnly', ctypes.c_int)]
+
+
+class _ShmImage:
+    """XImage living in System V shared memory, with numpy BGR view on it. Smaller rectangles are grabbed
+    into the same memory (rows of 32 bit pixels are not padded, so they lie at width * 4 bytes)"""
+    def __init__(self, backend, width, height):
+        self.backend = backend
+        self.info = _XShmSegmentInfo()
+        self.image = backend.xext.XShmCreateImage(backend.display, backend.visual, backend.depth, 2,  # ZPixmap
+                                                  None, ctypes.byref(self.info), width, height)
+        if not self.image or self.image.contents.bits_per_pixel != 32 \
+                or self.image.contents.bytes_per_line != width * 4:
+            raise OSError('XShmCreateImage failed (only 32 bits per pixel screens are supported)')
+        size = self.image.contents.bytes_per_line * height
+        self.info.shmid = backend.libc.shmget(0, size, 0o1777)  # IPC_PRIVATE, IPC_CREAT | 0777
+        if self.info.shmid < 0:
+            raise OSError(ctypes.get_errno(), 'shmget failed')
+        self.info.shmaddr = backend.libc.shmat(self.info.shmid, None, 0)
+        self.image.contents.data = self.info.shmaddr
+        self.info.readOnly = 0
+        backend.xext.XShmAttach(backend.display, ctypes.byref(self.info))
+        backend.x11.XSync(backend.display, 0)
+        # segment is removed as soon as both X server and we detach from it
+        backend.libc.shmctl(self.info.shmid, 0, None)  # IPC_RMID
+        self.width = width
+        self.height = height
+        self.buffer = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(self.info.shmaddr))
+
+    def grab(self, x, y, w, h):
+        image = self.image.contents
+        image.width, image.height, image.bytes_per_line = w, h, w * 4
+        try:
+            self.backend.xext.XShmGetImage(self.backend.display, self.backend.root, self.image, x, y,
+                                           ctypes.c_ulong(-1))  # AllPlanes
+        finally:
+            image.width, image.height, image.bytes_per_line = self.width, self.height, self.width * 4
+        return self.buffer[:w * h * 4].reshape(h, w, 4)[:, :, :3]
+
+    def close(self):
+        self.backend.xext.XShmDetach(self.backend.display, ctypes.byref(self.info))
+        self.backend.libc.shmdt(ctypes.c_void_p(self.info.shmaddr))
+
+
+class XShmBackend(CaptureBackend):
+    """X11 MIT-SHM capture - X server copies screen straight into shared memory, which is returned as numpy
+    view without any conversion. Two screen sized buffers are used in turn, so the previous frame stays valid
+    while the next one is grabbed. Regions are grabbed into third buffer and returned as copies - shared
+    memory does not grow with number of distinct regions."""
+    def __init__(self, display=None):
+        x11, xext, libc = (ctypes.util.find_library(name) for name in ('X11', 'Xext', 'c'))
+        if not x11 or not xext:
+            raise OSError('libX11 or libXext not found')
+        self.x11 = ctypes.CDLL(x11)
+        self.xext = ctypes.CDLL(xext)
+        self.libc = ctypes.CDLL(libc, use_errno=True)
+        self.x11.XOpenDisplay.restype = ctypes.c_void_p
+        self.x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        self.x11.XRootWindow.restype = ctypes.c_ulong
+        self.x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XDefaultVisual.restype = ctypes.c_void_p
+        self.x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        self.xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        self.xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                              ctypes.c_char_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint]
+        self.xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self.xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self.xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                           ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        self.libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        self.libc.shmat.restype = ctypes.c_void_p
+        self.libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        self.libc.shmdt.argtypes = [ctypes.c_void_p]
+        self.libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        self.display = self.x11.XOpenDisplay(display.encode() if display else None)
+        if not self.display:
+            raise OSError('can not open X display {}'.format(display or os.environ.get('DISPLAY')))
+        if not self.xext.XShmQueryExtension(self.display):
+            self.x11.XCloseDisplay(self.display)
+            raise OSError('X server has no MIT-SHM extension')
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        self.width = self.x11.XDisplayWidth(self.display, screen)
+        self.height = self.x11.XDisplayHeight(self.display, screen)
+        self._images = []
+
+    def size(self):
+        return self.width, self.height
+
+    def grab(self, region=None):
+        if not self._images:
+            self._images = [_ShmImage(self, self.width, self.height) for _ in range(3)]
+        if region is None:
+            self._images[:2] = self._images[1::-1]
+            return self._images[0].grab(0, 0, self.width, self.height)
+        x, y, w, h = region
+        return self._images[2].grab(x, y, w, h).copy()
+
+    def close(self):
+        for image in self._images:
+            image.close()
+        self._images = []
+        self.x11.XCloseDisplay(self.display)
+
+
+class FileBackend(CaptureBackend):
+    """Serves recorded frames from image file, directory of pngs (in name order) or list of paths.
+    Every frame is decoded once, grab returns view on the current one, advance() moves to next frames
+    (the last frame stays current)."""
+    def __init__(self, source):
+        if isinstance(source, str) and os.path.isdir(source):
+            self.paths = sorted(glob.glob(os.path.join(source, '*.png')))
+        elif isinstance(source, str):
+            self.paths = [source]
+        else:
+            self.paths = list(source)
+        if not self.paths:
+            raise OSError('no frames in {}'.format(source))
+        self.index = 0
+        self._frames = dict()
+
+    def frame(self):
+        if self.index not in self._frames:
+            frame = cv.imread(self.paths[self.index], cv.IMREAD_COLOR)
+            if frame is None:
+                raise OSError('can not read frame {}'.format(self.paths[self.index]))
+            self._frames[self.index] = frame
+        return self._frames[self.index]
+
+    def advance(self, steps=1):
+        self.index = max(min(self.index + steps, len(self.paths) - 1), 0)
+
+    def size(self):
+        height, width = self.frame().shape[:2]
+        return width, height
+
+    def grab(self, region=None):
+        frame = self.frame()
+        if region is None:
+            return frame
+        x, y, w, h = region
+        return frame[y:y + h, x:x + w]
+
+
+def default_backend():
+    """MIT-SHM on Linux with X11 (if available), pyautogui otherwise"""
+    if sys.platform.startswith('linux'):
+        try:
+            return XShmBackend()
+        except OSError as e:
+            logging.info('MIT-SHM capture not available ({}) - using pyautogui'.format(e))
+    return PyAutoGuiBackend()
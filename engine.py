@@ -0,0 +1,312 @@
+"""Asyncio engine of island tasks. Adventure actions, sending explorers, buffing and confirming tasks are
+coroutines, which wait (delays of actions, intervals of periodic tasks) without blocking each other and take
+the mouse and keyboard (UiLock) only for their UI work. UI work itself is blocking (my_pygui), it runs on one
+worker thread, so the event loop keeps scheduling meanwhile.
+Usage:
+    island = engine.Engine(Adventure('drwal'))
+    island.run(island.adventures('drwal', 10, 16 * 60, stop=118))
+Periodic tasks start at once and then repeat every explorers/buffs/tasks seconds."""
+import asyncio
+import functools
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import my
+import my_pygui
+import ocr
+from my_types import Mode
+from tracer import trace
+
+ADVENTURE = 0
+EXPLORERS = 1
+BUFFS = 2
+TASKS = 3
+
+
+def _plain(method):
+    """return bound method without my.send_explorer_while_error - its recovery loops forever (holding the UI),
+    engine handles errors of island tasks itself"""
+    function = getattr(method, '__wrapped__', None)
+    return method if function is None else functools.partial(function, method.__self__)
+
+
+def report():
+    """logs statistics of the run (main.run, Engine.run) and saves latency histograms"""
+    logging.info('frame cache: {}'.format(my_pygui.frame_cache.stats()))
+    logging.info('templates: {}'.format(my_pygui.templates.stats()))
+    logging.info('hot regions: {}'.format(my_pygui.hot_regions.stats()))
+    logging.info('waits: {}'.format(my_pygui.wait_until.stats()))
+    logging.info('change detector: {}'.format(my_pygui.change_detector.stats()))
+    logging.info('input pacing: {}'.format(my_pygui.pacer.report()))
+    logging.info('latency: {}'.format(my_pygui.latency.stats()))
+    logging.info('ocr cache: {}'.format(ocr.cache.stats()))
+    my_pygui.latency.dump('save/latency.json')
+
+
+class UiLock:
+    """Single owner of mouse and keyboard. Waiting tasks get the UI by priority (lower first), then deadline.
+    Task is let in only if its estimated duration ends before the nearest reservation of other task
+    (reserve(name, at), monotonic time), so long periodic tasks do not delay adventure actions.
+    on_idle() is called (soon) whenever the UI stays free."""
+    def __init__(self, on_idle=None):
+        self.owner = None
+        self.on_idle = on_idle
+        self._waiting = []
+        self._reservations = dict()
+        self._count = 0
+        self._timer = None
+
+    def reserve(self, name, at):
+        self._reservations[name] = at
+        self._wake()
+
+    def cancel(self, name):
+        self._reservations.pop(name, None)
+        self._wake()
+
+    async def acquire(self, name, priority, deadline=None, duration=0.):
+        future = asyncio.get_running_loop().create_future()
+        self._count += 1
+        entry = (priority, float('inf') if deadline is None else deadline, self._count, name, duration, future)
+        heapq.heappush(self._waiting, entry)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            elif self.owner == name:
+                self.release()
+            raise
+
+    def release(self):
+        self.owner = None
+        self._wake()
+
+    def _fits(self, name, duration):
+        end = my_pygui.clock.monotonic() + duration
+        return all(end <= at for owner, at in self._reservations.items() if owner != name)
+
+    def _wake(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.owner is not None:
+            return
+        for entry in sorted(self._waiting):
+            name, duration, future = entry[3:]
+            if not future.done() and self._fits(name, duration):
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self.owner = name
+                future.set_result(True)
+                return
+        if self._waiting:
+            # nothing fits before the nearest reservation - try again when it has passed
+            self._timer = asyncio.get_running_loop().call_later(1, self._wake)
+        if self.on_idle is not None:
+            asyncio.get_running_loop().call_soon(self.on_idle)
+
+
+class _Ui:
+    def __init__(self, lock, name, priority, deadline, duration):
+        self.lock = lock
+        self.args = name, priority, deadline, duration
+
+    async def __aenter__(self):
+        await self.lock.acquire(*self.args)
+
+    async def __aexit__(self, *exc):
+        self.lock.release()
+
+
+class Engine:
+    """Runs coroutines of Adventure adv on one event loop. Durations of periodic tasks are learned (seconds,
+    starting with durations) and used when they compete for UI with reservations of adventure actions."""
+    def __init__(self, adv, explorers=16 * 60, buffs=16 * 60, tasks=30 * 60,
+                 durations=None, smoothing=.5):
+        self.adv = adv
+        self.every = {'explorers': explorers, 'buffs': buffs, 'tasks': tasks}
+        self.durations = dict({'explorers': 60., 'buffs': 60., 'tasks': 90.}, **(durations or dict()))
+        self.smoothing = smoothing
+        self.lock = UiLock(self._advance)
+        self._sleepers = []
+        self._woken = set()
+        self._count = 0
+        self.in_adventure = False
+        self.due = dict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ui')
+
+    def ui(self, name, priority, deadline=None, duration=0.):
+        """async context manager of the UI lock: async with engine.ui('explorers', EXPLORERS): ..."""
+        return _Ui(self.lock, name, priority, deadline, duration)
+
+    async def call(self, function, *args):
+        """runs blocking UI function on the UI thread (the caller has to hold the UI lock)"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, lambda: function(*args))
+
+    async def sleep_until(self, at):
+        """waits until monotonic time at (my_pygui.clock). Virtual clock is moved by _advance"""
+        if not my_pygui.clock.virtual:
+            seconds = at - my_pygui.clock.monotonic()
+            if seconds > 0:
+                await asyncio.sleep(seconds)
+            return
+        self._count += 1
+        entry = (at, self._count, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._sleepers, entry)
+        asyncio.get_running_loop().call_soon(self._advance)
+        try:
+            await entry[2]
+        except asyncio.CancelledError:
+            if entry in self._sleepers:
+                self._sleepers.remove(entry)
+                heapq.heapify(self._sleepers)
+            raise
+        finally:
+            self._woken.discard(entry[2])
+
+    def _advance(self):
+        """virtual clock: when no task holds the UI, moves the clock to the earliest wake time of sleeping
+        tasks (not further - the others keep their order) and wakes the tasks due. Clock waits until the woken
+        tasks ran up to their next wait"""
+        if not my_pygui.clock.virtual or self.lock.owner is not None or self._woken or not self._sleepers:
+            return
+        my_pygui.clock.sleep(self._sleepers[0][0] - my_pygui.clock.monotonic())
+        now = my_pygui.clock.monotonic()
+        while self._sleepers and self._sleepers[0][0] <= now:
+            future = heapq.heappop(self._sleepers)[2]
+            if not future.done():
+                future.set_result(True)
+                self._woken.add(future)
+
+    def on_island(self, function, *args):
+        """runs function on home island, travelling there and back if adventure is being made"""
+        go_to_adventure = _plain(self.adv.go_to_adventure)
+        away = self.in_adventure and not _plain(self.adv.check_if_in_island)()
+        if away:
+            my_pygui.hotkey('ESC')
+            go_to_adventure()
+        function(*args)
+        if away:
+            go_to_adventure(10)
+            self.adv.focused = False
+
+    async def periodic(self, name, priority, function, *args):
+        """runs function (on island) every self.every[name] seconds, when UI is free long enough"""
+        self.due[name] = my_pygui.clock.monotonic()
+        while True:
+            try:
+                async with self.ui(name, priority, duration=self.durations[name]):
+                    t0 = my_pygui.clock.monotonic()
+                    await self.call(self.on_island, function, *args)
+                    took = my_pygui.clock.monotonic() - t0
+            except Exception:
+                # the task is tried again in the next period
+                logging.exception('engine task {} failed'.format(name))
+            else:
+                self.durations[name] += self.smoothing * (took - self.durations[name])
+                trace('Engine task', name, round(took, 1))
+            self.due[name] = my_pygui.clock.monotonic() + self.every[name]
+            await self.sleep_until(self.due[name])
+
+    def _free_until(self, at):
+        """return True if no island task waits for UI or is due before monotonic time at"""
+        return not self.lock._waiting and all(due >= at for due in self.due.values())
+
+    async def stage(self, action, begin):
+        """pre-stages planned action (Adventure.stage_action) - caller holds the UI - if its preparation
+        starts (begin) at least stage_window seconds later and no island task needs the UI before its deadline
+        (it would lose the staged general). return (new) time preparation of action has to start"""
+        scheduler = self.adv.scheduler
+        if begin - my_pygui.clock.monotonic() < scheduler.stage_window or not self._free_until(scheduler.deadline):
+            return begin
+        scheduler.staged = bool(await self.call(self.adv.stage_action, action))
+        if not scheduler.staged:
+            return begin
+        return scheduler.deadline - scheduler.estimate(action, staged=True)
+
+    async def adventure(self, start=0, stop=1000):
+        """makes actions of adventure (as Adventure.make_adventure, mode play) on their deadlines. Preparation
+        of the next action is reserved in UI lock, so other tasks use only the gaps before it. When none of them
+        needs the UI before the next deadline, the next action is pre-staged at once (stage)"""
+        adv = self.adv
+        # as Adventure.make_adventure - error of action ends in sending explorers and buffing (until restart)
+        make_action = my.send_explorer_while_error(type(adv).make_action)
+        self.in_adventure = True
+        try:
+            async with self.ui('adventure', ADVENTURE):
+                if not adv.generals_loc:
+                    adv.generals_loc = await self.call(my.send_explorer_while_error(type(adv).init_locate_generals),
+                                                       adv, start)
+            adv.scheduler.reset()
+            actions = [action for action in adv.data['actions'] if start <= action['no'] <= stop]
+            begin = None
+            for i, action in enumerate(actions):
+                planned = action['no'] != start
+                if planned:
+                    if begin is None:
+                        begin = adv.scheduler.plan(action)
+                        self.lock.reserve('adventure', begin)
+                    await self.sleep_until(begin)
+                async with self.ui('adventure', ADVENTURE, adv.scheduler.deadline):
+                    self.lock.cancel('adventure')
+                    await self.call(make_action, adv, action, Mode.play, start, planned)
+                    adv.scheduler.done()
+                    begin = None
+                    if i + 1 < len(actions):
+                        # reserved before the UI is released, so no task takes the time of preparation
+                        begin = await self.stage(actions[i + 1], adv.scheduler.plan(actions[i + 1]))
+                        self.lock.reserve('adventure', begin)
+                adv.scheduler.save('data/{}/prep.json'.format(adv.name))
+        finally:
+            self.lock.cancel('adventure')
+        logging.info('action drift: {}'.format(adv.scheduler.report()))
+
+    async def adventures(self, adv_name, delay, gap, start=0, stop=999):
+        """as main.run: starts adventure, sends generals, waits gap (travel of generals), makes and ends the
+        adventure - island tasks run in the waits"""
+        adv = self.adv
+        if gap > 0:
+            async with self.ui('adventure', ADVENTURE):
+                send_delay = delay
+                if start == 0:
+                    await self.call(adv.start_adventure, adv_name, delay)
+                    send_delay = 10
+                if start <= 0:
+                    await self.call(adv.send_to_adventure, send_delay, -start, 200)
+                    start = 0
+            await self.sleep_until(my_pygui.clock.monotonic() + gap)
+            async with self.ui('adventure', ADVENTURE):
+                await self.call(adv.go_to_adventure, 10)
+                self.in_adventure = True
+            await self.sleep_until(my_pygui.clock.monotonic() + 30)
+        else:
+            self.in_adventure = True
+            await self.sleep_until(my_pygui.clock.monotonic() + 3)
+        await self.adventure(start, stop)
+        async with self.ui('adventure', ADVENTURE):
+            await self.call(adv.end_adventure, 30, Mode.play)
+            self.in_adventure = False
+        await self.sleep_until(my_pygui.clock.monotonic() + 30)
+
+    def run(self, coroutine):
+        """runs coroutine (e.g. adventures(...)) together with periodic island tasks, until it ends (or is
+        interrupted), then reports statistics of the run"""
+        async def main():
+            tasks = [asyncio.ensure_future(self.periodic('explorers', EXPLORERS,
+                                                         _plain(self.adv.send_explorer_by_client))),
+                     asyncio.ensure_future(self.periodic('buffs', BUFFS, _plain(self.adv.buff_by_client))),
+                     asyncio.ensure_future(self.periodic('tasks', TASKS, _plain(self.adv.confirm_task), 0, False))]
+            try:
+                return await coroutine
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            return asyncio.run(main())
+        finally:
+            self._executor.shutdown(wait=False)
+            report()
@@ -0,0 +1,99 @@
+"""Latency histograms and call counters of my_pygui primitives (per primitive, broken down by key,
+e.g. template name and region size). Histograms are HDR-style: values (microseconds) are counted exactly
+below 2 ** precision and with relative error below 2 ** -precision above it, in fixed memory per range."""
+import json
+import threading
+
+
+class Histogram:
+    def __init__(self, precision=5):
+        self.precision = precision
+        self.counts = dict()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _bucket(self, value):
+        shift = max(value.bit_length() - self.precision, 0)
+        return shift, value >> shift
+
+    def record(self, seconds):
+        value = max(int(seconds * 1e6), 0)
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """return value (seconds) below which is percent of recorded values (middle of its bucket)"""
+        if not self.count:
+            return 0.
+        limit = self.count * percent / 100
+        seen = 0
+        for (shift, value), count in sorted(self.counts.items(), key=lambda i: i[0][1] << i[0][0]):
+            seen += count
+            if seen >= limit:
+                return min((value << shift) + (1 << shift) // 2, self.max) / 1e6
+        return self.max / 1e6
+
+    def as_dict(self):
+        return {'calls': self.count,
+                'mean': round(self.total / self.count / 1e6, 6) if self.count else 0.,
+                'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'p99': self.percentile(99),
+                'max': self.max / 1e6}
+
+
+class Latency:
+    """Registry of histograms: record(primitive, key, seconds), stats() and dump(path)"""
+    def __init__(self, precision=5):
+        self.precision = precision
+        self._histograms = dict()
+        self._lock = threading.Lock()
+
+    def record(self, primitive, key, seconds):
+        with self._lock:
+            histogram = self._histograms.get((primitive, key))
+            if histogram is None:
+                histogram = self._histograms[(primitive, key)] = Histogram(self.precision)
+            histogram.record(seconds)
+
+    def histogram(self, primitive, key=None):
+        """return histogram of primitive (all keys merged, if key is None)"""
+        merged = Histogram(self.precision)
+        with self._lock:
+            for (name, name_key), histogram in self._histograms.items():
+                if name == primitive and (key is None or name_key == key):
+                    merged.merge(histogram)
+        return merged
+
+    def stats(self):
+        """return {primitive: totals with 'by': {key: stats}}"""
+        result = dict()
+        with self._lock:
+            items = sorted(self._histograms.items())
+        for (primitive, key), histogram in items:
+            result.setdefault(primitive, {'by': dict()})['by'][key] = histogram.as_dict()
+        for primitive in result:
+            result[primitive].update(self.histogram(primitive).as_dict())
+        return result
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = dict()
+
+
+latency = Latency()
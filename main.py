@@ -28,14 +28,17 @@ $ (env)> pip install pytesseract
 """
 
 import json
+import math
 import pickle
 import time
 import my_pygui
 import logging
 import my
 import listener
+import engine
 import ocr
 import os
+import scheduler
 import pyperclip
 from my_types import Point, Mode, AdventureSearch, TreasureSearch
 
@@ -44,6 +47,11 @@ for handler in logging.root.handlers[:]:
     logging.root.removeHandler(handler)
 logging.basicConfig(level=logging.INFO)
 STAROPEN = False
+# distance between specialists icons in star window (x, y)
+SPECIALISTS_GRID = (56, 70)
+# map scale change by one zoom step ('-' key), three steps out scale map by 142 / 246
+ZOOM_STEP = (142 / 246) ** (1 / 3)
+REFERENCE_SCALES = tuple(ZOOM_STEP ** steps for steps in range(-2, 6))
 
 
 class Adventure:
@@ -56,14 +64,19 @@ class Adventure:
         #     self.data = json.load(f)
         with open('data/conf.dat', 'rb') as config_dictionary_file:
             self.coordinations = pickle.load(config_dictionary_file)
+        my_pygui.templates.load_dir('resource')
+        my_pygui.templates.load_adventure(name)
+        my_pygui.hot_regions.load(name)
         self.generals_loc = None
         self.focused = None
         self.c_data = None
         self.c_listdir = None
+        self.scheduler = scheduler.ActionScheduler()
+        self.scheduler.load('data/{}/prep.json'.format(name))
 
     def init_locate_generals(self, start=0):
         log.info('init_locate_generals:')
-        time.sleep(.5)
+        my_pygui.clock.sleep(.5)
         if start == 0 or not os.path.exists('data/{}/generals_loc.dat'.format(self.name)):
             generals = dict()
             self.open_star()
@@ -76,25 +89,17 @@ class Adventure:
                 else:
                     generals[general['type']] = [general['id']]
             generals_loc = 100 * [None]
+            star_window_cor = self.coordinations['specialists'] - Point(137, 400)
+            hits = my_pygui.locateTemplatesOnScreen(dict((general_type, [general_type, general_type + '_'])
+                                                         for general_type in generals),
+                                                    region=(star_window_cor.x, star_window_cor.y, 600, 400),
+                                                    confidence=0.97,
+                                                    grid=SPECIALISTS_GRID)
             for general_type, ids in generals.items():
-                star_window_cor = self.coordinations['specialists'] - Point(137, 400)
-                locations = list(my_pygui.locateAllOnScreen('resource/{}.png'.format(general_type),
-                                                            region=(star_window_cor.x, star_window_cor.y, 600, 400),
-                                                            confidence=0.97))
-                locations.extend(my_pygui.locateAllOnScreen('resource/{}_.png'.format(general_type),
-                                                            region=(star_window_cor.x, star_window_cor.y, 600, 400),
-                                                            confidence=0.97))
                 # TODO necessary if part of army sent back. Temporary solution.
                 # if not locations:
                 #     continue
-                locations.sort(key=lambda i: i.y)
-                y_standardized = locations[0].y
-                for loc in locations:
-                    if abs(y_standardized - loc.y) < 10:
-                        loc.y = y_standardized
-                    else:
-                        y_standardized = loc.y
-                locations.sort(key=lambda i: i.y * 10000 + i.x)
+                locations = [hit for hit in hits if hit.label == general_type]
                 for id_ in ids:
                     generals_loc[id_] = locations.pop(0)
             while True:
@@ -127,48 +132,34 @@ class Adventure:
     def open_star_tab(self, name, verify=True):
         log.info('open_{}'.format(name))
         my_pygui.click(self.coordinations[name].get())
-        try_count = 0
-        while verify:
+        if verify:
             log.info('verify if {} is open'.format(name))
             verify_area = self.coordinations[name]
-            time.sleep(.5)
-            loc = my_pygui.locateOnScreen('resource/{}.png'.format(name),
-                                          region=(verify_area.x - 20, verify_area.y - 20, 40, 45),
-                                          confidence=0.95)
-            if loc:
-                log.info('{} open verification succeed'.format(name))
-                break
-            else:
-                log.info('{} open verification false - trying again'.format(name))
-                my.wait(try_count, '{} open verification false - trying again'.format(name))
-                my_pygui.click(self.coordinations[name].get())
-                if try_count < 10:
-                    try_count += 1
-                else:
-                    raise Exception('{} open verification failed in 10 tryes'.format(name))
+            loc = my_pygui.wait_until_visible(name,
+                                              timeout=60,
+                                              region=(verify_area.x - 20, verify_area.y - 20, 40, 45),
+                                              confidence=0.95,
+                                              on_retry=lambda: my_pygui.click(self.coordinations[name].get()),
+                                              retry_every=3)
+            if not loc:
+                raise Exception('{} open verification failed in 60 s'.format(name))
+            log.info('{} open verification succeed'.format(name))
 
     def open_star(self, verify=True):
         log.info('open_star')
         my_pygui.click(self.coordinations['star'].get())
-        try_count = 0
-        while verify:
+        if verify:
             log.info('verify if star is open')
             star_close = self.coordinations['star_close']
-            time.sleep(.5)
-            loc = my_pygui.locateOnScreen('resource/star_verify.png',
-                                          region=(star_close.x - 20, star_close.y, 40, 45),
-                                          confidence=0.85)
-            if loc:
-                log.info('star open verification succeed')
-                break
-            else:
-                log.info('star open verification false - trying again')
-                my.wait(try_count, 'star open verification false - trying again')
-                my_pygui.click(self.coordinations['star'].get())
-                if try_count < 10:
-                    try_count += 1
-                else:
-                    raise Exception('star open verification failed in 10 tryes')
+            loc = my_pygui.wait_until_visible('star_verify',
+                                              timeout=60,
+                                              region=(star_close.x - 20, star_close.y, 40, 45),
+                                              confidence=0.85,
+                                              on_retry=lambda: my_pygui.click(self.coordinations['star'].get()),
+                                              retry_every=3)
+            if not loc:
+                raise Exception('star open verification failed in 60 s')
+            log.info('star open verification succeed')
 
     @my.send_explorer_while_error
     def start_adventure(self, adv_name, delay=0):
@@ -181,7 +172,7 @@ class Adventure:
         self.write_star_text(adv_name)
         my.wait(2, 'Adv search')
         star_window_corner = self.coordinations['adventures'] - Point(454, 371)
-        loc = my_pygui.locateOnScreen('resource/is_adv.png'.format(self.name),
+        loc = my_pygui.locateOnScreen('is_adv',
                                       region=(star_window_corner.x, star_window_corner.y, 95, 73),
                                       confidence=0.85)
         if loc is None:
@@ -189,12 +180,12 @@ class Adventure:
         else:
             my_pygui.click(self.coordinations['first_general'].get())
         my.wait(2)
-        loc = my_pygui.locateOnScreen('resource/start_adventure.png', confidence=0.9)
+        loc = my_pygui.locateOnScreen('start_adventure', confidence=0.9)
         if loc is None:
             raise Exception('Button not found.')
         else:
             my_pygui.click(loc.get())
-        loc = my_pygui.locateOnScreen('resource/confirm.png'.format(self.name), confidence=0.9)
+        loc = my_pygui.locateOnScreen('confirm', confidence=0.9)
         if loc is None:
             raise Exception('Button not found.')
         else:
@@ -206,57 +197,43 @@ class Adventure:
         log.info('set_army')
         count = 0
         army = general['army']
-        time.sleep(2)
+        my_pygui.clock.sleep(2)
         while True:
             log.info('Setting army, try {}'.format(count + 1))
-            loc = my_pygui.locateOnScreen('resource/army.png',
+            loc = my_pygui.locateOnScreen('army',
                                           region=self.coordinations['first_army_region'],
                                           confidence=.95,
                                           center=False)
             elite = general.get('elite', False)
             if (loc and elite) or (not loc and not elite):
                 my_pygui.click(self.coordinations['elite'].get())
-                time.sleep(3)
+                my_pygui.clock.sleep(3)
             my_pygui.click(self.coordinations['unload'].get())
+            fields = self.locate_army_fields([units for units, quantity in army.items() if quantity != 0])
+            operations = []
             for units, quantity in army.items():
                 if quantity != 0:
-                    init_x, y = self.coordinations[units].get()
-                    for x in range(init_x, init_x - 50, -24):
-                        if not my_pygui.pixelMatchesColor(x, y, (131, 102, 65), tolerance=10):
-                            loc = x, y - 7
-                            break
-                    else:
-                        raise Exception('text field not found')
-                    my_pygui.click(loc)
-                    my_pygui.write('{}'.format(quantity))
-            my_pygui.click(self.coordinations['confirm_army'].get())
-            time.sleep(4)
+                    operations += [('click', fields[units].get()), ('write', '{}'.format(quantity))]
+            my_pygui.input_batch(operations + [('click', self.coordinations['confirm_army'].get())])
+            my_pygui.clock.sleep(4)
             """verify"""
             x_t, y_t = self.coordinations['move'].get()
-            finded, re_selected = False, False
-            while not finded:
-                for i in range(3):
-                    finded = my_pygui.locateOnScreen('resource/transfer.png',
-                                                     region=(x_t - 30, y_t - 165, 60, 200),
-                                                     confidence=0.97)
-                    if finded:
-                        log.info('General ready = transfer button active')
-                        break
-                    else:
-                        log.warning('General not ready yet. Trying again after 3 sec')
-                        my.wait(3, 'Trying again')
-                else:
-                    """re selecting only once"""
-                    if not re_selected:
-                        log.warning('General not ready after 3 tryes. Re selecting')
-                        self.select_general_by_loc(general_loc, general['type'], verify=False)
-                        re_selected = True
-                    else:
-                        log.error('General not ready after re select. Abort')
-                        raise Exception('General not ready after re select.')
+            transfer_region = (x_t - 30, y_t - 165, 60, 200)
+            if not my_pygui.wait_until_visible('transfer', timeout=9, region=transfer_region, confidence=0.97,
+                                               name='general_ready'):
+                """re selecting only once"""
+                log.warning('General not ready in 9 s. Re selecting')
+                self.select_general_by_loc(general_loc, general['type'], verify=False)
+                if not my_pygui.wait_until_visible('transfer', timeout=9, region=transfer_region, confidence=0.97,
+                                                   name='general_ready'):
+                    log.error('General not ready after re select. Abort')
+                    raise Exception('General not ready after re select.')
+            log.info('General ready = transfer button active')
             x, y = self.coordinations['army_sum'].get()
             army_sum_screen = my_pygui.screenshot(region=(x, y, 314, 14))
             if ocr.assigned_unit_sum(army_sum_screen) == sum(army.values()):
+                # reading agreed with the army set - its glyphs can be learned
+                ocr.glyphs.confirm(str(sum(army.values())))
                 break
             else:
                 """try again"""
@@ -265,6 +242,16 @@ class Adventure:
                 if count >= 3:
                     raise Exception('Could not set army in 3 tryes')
 
+    def locate_army_fields(self, units):
+        """return dict units: Point of text fields for given units in army panel, found in one screenshot"""
+        fields = my_pygui.locateColorChange(dict((key, self.coordinations[key]) for key in units),
+                                            (131, 102, 65), tolerance=10, step=-24, count=3)
+        for key, point in fields.items():
+            if point is None:
+                raise Exception('text field not found')
+            fields[key] = point - Point(0, 7)
+        return fields
+
     def select_general_by_loc(self, loc, general_type, verify=True, recursion=0):
         log.info('select_general_by_loc')
         """selecting general by loc from star, 
@@ -277,30 +264,28 @@ class Adventure:
         my_pygui.click(self.coordinations['specialists'].get())
         if verify:
             log.info('verify if general is active')
-            t0 = time.time()
-            t1 = time.time()
-            while True:
-                if time.time() - t0 < 5 * 60:
-                    if time.time() - t1 > 55:
-                        t1 = time.time()
-                        my_pygui.hotkey('f2')
-                    if self.verify_if_general_active(loc, general_type):
-                        log.info('active general selected after {} s.'.format(time.time() - t0))
-                        break
-                else:
-                    raise Exception('no active general in 5 min found')
+            with self.scheduler.waiting():
+                active = my_pygui.wait_until(lambda: self.verify_if_general_active(loc, general_type),
+                                             timeout=5 * 60,
+                                             max_interval=3,
+                                             on_retry=lambda: my_pygui.hotkey('f2'),
+                                             retry_every=55,
+                                             name='general_active')
+            if not active:
+                raise Exception('no active general in 5 min found')
+            log.info('active general selected')
         my_pygui.click(loc.get())
         # verify if general opened
         x_t, y_t = self.coordinations['move'].get()
-        time.sleep(.5)
-        finded = my_pygui.locateOnScreen('resource/transfer.png',
+        my_pygui.clock.sleep(.5)
+        finded = my_pygui.locateOnScreen('transfer',
                                          region=(x_t - 30, y_t - 165, 60, 200),
                                          confidence=0.97)
         if finded:
             return True
         else:
             x_t, y_t = self.coordinations['star'].get()
-            finded = my_pygui.locateOnScreen('resource/star_cancel.png',
+            finded = my_pygui.locateOnScreen('star_cancel',
                                              region=(x_t - 95, y_t - 80, 190, 120),
                                              confidence=0.97)
             if finded:
@@ -319,15 +304,13 @@ class Adventure:
 
     @staticmethod
     def verify_if_general_active(loc, general_type):
-        finded = my_pygui.locateOnScreen('resource/{}.png'.format(general_type),
+        finded = my_pygui.locateOnScreen(general_type,
                                          region=(loc.x - 30, loc.y - 30, 60, 60),
                                          confidence=0.97)
         if finded:
             return True
         else:
-            log.warning('no active general of type {} found in this location. Trying again after 3 sec'
-                        .format(general_type))
-            time.sleep(3)
+            log.warning('no active general of type {} found in this location'.format(general_type))
             return False
 
     def get_generals_by_type(self, general_type, general_name=None):
@@ -340,8 +323,8 @@ class Adventure:
         general = general_name or general_type
         self.write_star_text(general)
         star_window_corner = self.coordinations['specialists'] - Point(137, 400)
-        time.sleep(2)
-        locations = my_pygui.locateAllOnScreen('resource/{}.png'.format(general_type),
+        my_pygui.clock.sleep(2)
+        locations = my_pygui.locateAllOnScreen(general_type,
                                                region=(star_window_corner.x, star_window_corner.y, 600, 400),
                                                confidence=0.97)
         return locations
@@ -364,7 +347,7 @@ class Adventure:
                 send_co = self.coordinations['send']
             my_pygui.click(send_co.get())
             my_pygui.click(self.coordinations['send_confirm'].get())
-            time.sleep(2)
+            my_pygui.clock.sleep(2)
             if item_no < len(generals_of_type) - 1:
                 self.open_star()
                 my_pygui.click(self.coordinations['specialists'].get())
@@ -389,14 +372,11 @@ class Adventure:
         my_pygui.click(self.coordinations['specialists'].get())
         self.write_star_text('genera')
         my_pygui.click(self.coordinations['first_general'].get())
-        time.sleep(.5)
+        my_pygui.clock.sleep(.5)
+        available = self.get_available_army([key for key, val in army.items() if val])
         for key, val in army.items():
-            if val:
-                log.info('Checking available {}'.format(key))
-                x, y = self.coordinations[key].get()
-                screen = my_pygui.screenshot(region=(x - 43, y - 13, 82, 13))
-                if ocr.available_unit(screen) < val:
-                    raise Exception('Not enough {}'.format(key))
+            if val and available[key] < val:
+                raise Exception('Not enough {}'.format(key))
         self.open_star()
         my_pygui.click(self.coordinations['specialists'].get())
         self.write_star_text('')
@@ -427,13 +407,18 @@ class Adventure:
         self.write_star_text('')
         my_pygui.click(self.coordinations['star_close'].get())
 
+    def get_available_army(self, units):
+        """return dict unit: available units, read from one capture of the (opened) army panel"""
+        regions = [(self.coordinations[key].x - 43, self.coordinations[key].y - 13, 82, 13) for key in units]
+        return dict(zip(units, ocr.available_units(my_pygui.grab_regions(regions))))
+
     @my.send_explorer_while_error
     def go_to_adventure(self, delay=0, any_=True):
         log.info('go_to_adventure')
 
         my.wait(delay, 'Going to adventure')
-        adv_path = 'resource/any_adv.png' if any_ else 'data/{}/goto_adv.png'.format(self.name)
-        loc = my_pygui.locateOnScreen(adv_path,
+        adv_key = 'any_adv' if any_ else 'adventure/goto_adv'
+        loc = my_pygui.locateOnScreen(adv_key,
                                       region=(1800, 300, 60, 400),
                                       confidence=0.85, )
         if loc is None:
@@ -462,21 +447,17 @@ class Adventure:
         my.wait(delay, 'Making adventure')
         if not self.generals_loc:
             self.generals_loc = self.init_locate_generals(start)
-        t0 = time.time()
-        interval = 15 * 60
-        brake_adv = False
+        t0 = my_pygui.clock.time()
+        self.scheduler.reset()
         for action in self.data['actions']:
             if not (start <= action['no'] <= stop):
                 continue
-            print("------------------->>", time.time() - t0)
-            if brake_adv & (time.time() - t0 > interval):
-                log.warning('servicing island and resetting interval')
-                self.go_to_adventure()
-                self.send_explorer_by_client(30)
-                self.go_to_adventure(30)
-                my.wait(30, 'Continuing adventure')
-                t0 = time.time()
+            print("------------------->>", my_pygui.clock.time() - t0)
             self.make_action(action, mode, start)
+            self.scheduler.done()
+            if mode == Mode.play:
+                self.scheduler.save('data/{}/prep.json'.format(self.name))
+        log.info('action drift: {}'.format(self.scheduler.report()))
 
     @my.send_explorer_while_error
     def make_c_adventure(self, delay=0, start=0, stop=1000, mode=Mode.play):
@@ -486,19 +467,19 @@ class Adventure:
         with open('data/{}/c_learned.json'.format(self.name)) as f:
             self.c_data = json.load(f)
         self.c_listdir = self.c_get_listdir()
-        t0 = time.time()
+        t0 = my_pygui.clock.time()
         interval = 15 * 60
         for action in self.c_data['actions']:
             if not (start <= action['no'] <= stop):
                 continue
-            print("------------------->>", time.time() - t0)
-            if time.time() - t0 > interval:
+            print("------------------->>", my_pygui.clock.time() - t0)
+            if my_pygui.clock.time() - t0 > interval:
                 log.warning('servicing island and resetting interval')
                 self.go_to_adventure()
                 self.send_explorer_by_client(30)
                 self.go_to_adventure(30)
                 my.wait(30, 'Continuing adventure')
-                t0 = time.time()
+                t0 = my_pygui.clock.time()
             self.make_c_action(action, mode, start)
 
     def focus(self):
@@ -515,14 +496,51 @@ class Adventure:
         self.focus_on_first_general()
         # TODO function still useless
 
-    def make_action(self, action, mode, start):
+    def stage_action(self, action):
+        """pre-stages attack/move while waiting for it - selects its first general and sets the army, so only
+        the final clicks remain at the deadline. Generals have to be active already (no waiting for them).
+        return True if staged, if staging failed the star/general window is closed"""
+        general = action['generals'][0]
+        if action['type'] not in ('attack', 'move') or 'retreat' in general:
+            return False
+        log.info('stage_action {}'.format(action['no']))
+        try:
+            self.open_star()
+            my_pygui.click(self.coordinations['specialists'].get())
+            if not all(self.verify_if_general_active(self.generals_loc[g['id']], g['type'])
+                       for g in action['generals']):
+                log.info('generals of action {} not active yet - not staged'.format(action['no']))
+                my_pygui.click(self.coordinations['star_close'].get())
+                return False
+            general_loc = self.generals_loc[general['id']]
+            if not self.select_general_by_loc(general_loc, general['type'], verify=False):
+                raise Exception('general not on map')
+            if not general['preset']:
+                self.set_army(general_loc, general)
+        except Exception as e:
+            log.warning('staging action {} failed ({}) - rolled back'.format(action['no'], e))
+            my_pygui.press('esc')
+            return False
+        return True
+
+    def staged_general_ready(self):
+        """return True if pre-staged general is still selected (its transfer button visible)"""
+        x_t, y_t = self.coordinations['move'].get()
+        return bool(my_pygui.locateOnScreen('transfer', region=(x_t - 30, y_t - 165, 60, 200), confidence=0.97))
+
+    def make_action(self, action, mode, start, planned=False):
+        """planned - deadline of action is already planned and waited for (engine.Engine)"""
         log.info('make_action')
         if not self.focused:
             self.focus()
         get_click = listener.GetClick()
+        staged = False
         if not start == action['no']:
-            if mode == Mode.play:
-                my.wait(action['delay'], 'Next action ({})in'.format(action['no']))
+            if mode == Mode.play and planned:
+                self.scheduler.begin()
+                staged = self.scheduler.staged
+            elif mode == Mode.play:
+                staged = self.scheduler.prepare(action, self.stage_action)
             elif mode == Mode.teach_delay:
                 t_start = time.time()
                 text = 'Click OK when you want to do {1} ({0}) with generals:\n'.format(action['no'],
@@ -540,8 +558,9 @@ class Adventure:
         if action['type'] in 'buff':
             self.buff(action, mode)
         else:
-            if len(action['generals']) > 1:
-                self.verify_if_generals_active(action)
+            if len(action['generals']) > 1 and not staged:
+                with self.scheduler.waiting():
+                    self.verify_if_generals_active(action)
             for i, general in enumerate(action['generals']):
                 general_loc = self.generals_loc[general['id']]
                 if action['type'] in 'retrench':
@@ -553,6 +572,7 @@ class Adventure:
                     if not on_map:
                         raise Exception('general must be on map to retreat')
                     if mode == Mode.play or mode == Mode.teach_co:
+                        self.scheduler.fire()
                         my.wait(general['delay'], 'General retreat')
                         my_pygui.click(self.coordinations['retreat'].get())
                     elif mode == Mode.teach_delay:
@@ -563,12 +583,18 @@ class Adventure:
                         general['delay'] = int(time.time() - t_0)
                     continue
                 else:
-                    """only for first general - verify if star is open, and general is active 
-                    (assume rest is - to save time)"""
-                    verify = i == 0
-                    on_map = self.select_general_by_loc(general_loc, general['type'], verify=verify)
+                    if i == 0 and staged and not self.staged_general_ready():
+                        log.warning('pre-staged general of action {} lost, selecting again'.format(action['no']))
+                        staged = self.scheduler.staged = False
+                    if i == 0 and staged:
+                        on_map = True
+                    else:
+                        """only for first general - verify if star is open, and general is active 
+                        (assume rest is - to save time)"""
+                        verify = i == 0
+                        on_map = self.select_general_by_loc(general_loc, general['type'], verify=verify)
                 if on_map:
-                    if not general['preset']:
+                    if not general['preset'] and not (i == 0 and staged):
                         self.set_army(general_loc, general)
                         if action['type'] in ('unload', 'load'):
                             continue
@@ -618,6 +644,7 @@ class Adventure:
                             target = self.coordinations['center_ref'] - drag
                         else:
                             target = Point.from_list(general['relative_coordinates']) + finded
+                        self.scheduler.fire()
                         if 'delay' in general:
                             if mode == Mode.play:
                                 my.wait(general['delay'], 'Next general attacks')
@@ -633,6 +660,7 @@ class Adventure:
                     if mode == Mode.play or mode == Mode.teach_delay:
                         target = self.coordinations['center_ref'] - Point.from_list(general['relative_coordinates'])
                         my_pygui.moveTo(target.get())
+                        self.scheduler.fire()
                         if 'delay' in general:
                             if mode == Mode.play:
                                 my.wait(general['delay'], 'Next general attacks')
@@ -669,9 +697,9 @@ class Adventure:
             my_pygui.alert(text=text, title='Teaching Adventure {}'.format(self.name), button='OK')
         else:
             my.wait(general['delay'], 'General retrench')
-        loc = my_pygui.locateOnScreen('resource/retrench.png'.format(self.name), confidence=0.85)
+        loc = my_pygui.locateOnScreen('retrench', confidence=0.85)
         my_pygui.click(loc.get())
-        loc = my_pygui.locateOnScreen('resource/confirm.png'.format(self.name), confidence=0.9)
+        loc = my_pygui.locateOnScreen('confirm', confidence=0.9)
         my_pygui.click(loc.get())
         if mode == Mode.teach_delay:
             general['delay'] = int(time.time() - t_0)
@@ -692,7 +720,7 @@ class Adventure:
             my_pygui.hotkey('ctrl', 'a')
             my_pygui.hotkey('ctrl', 'c')
             try_count = 0
-            time.sleep(1)
+            my_pygui.clock.sleep(1)
             if text == pyperclip.paste():
                 break
             else:
@@ -707,24 +735,23 @@ class Adventure:
         log.info('move_verification')
         x_t, y_t = target.get()
         log.info('verifying if move succeed')
-        t0 = time.time()
-        while True:
-            time.sleep(.7)
-            loc = my_pygui.locateOnScreen('resource/confirm_move.png',
+
+        def move_again():
+            log.info('move verification false - trying again')
+            my_pygui.moveTo(target.get())
+            my_pygui.click(target.get(), clicks=2, interval=0.25)
+
+        loc = my_pygui.wait_until_visible('confirm_move',
+                                          timeout=5 * 60,
                                           confidence=0.8,
-                                          region=(x_t - 15, y_t - 55, 30, 50))
-            if loc:
-                log.info('move verification passed in {} s'.format(time.time() - t0))
-                break
-            else:
-                if time.time() - t0 < 5 * 60:
-                    log.info('move verification false - trying again')
-                    my_pygui.moveTo(target.get())
-                    my_pygui.click(target.get(), clicks=2, interval=0.25)
-                else:
-                    log.error('move_verification failed')
-                    raise Exception('verification failed')
-                # TODO niech powtarza action gdy failed - dopisać tu lub bam gdzie wywołyje
+                                          region=(x_t - 15, y_t - 55, 30, 50),
+                                          on_retry=move_again,
+                                          retry_every=1)
+        if not loc:
+            log.error('move_verification failed')
+            raise Exception('verification failed')
+            # TODO niech powtarza action gdy failed - dopisać tu lub bam gdzie wywołyje
+        log.info('move verification passed')
 
     @my.send_explorer_while_error
     def confirm_task(self, delay=0, ending=True, ending_retested=False):
@@ -739,7 +766,7 @@ class Adventure:
         while True:
             my_pygui.click((self.coordinations['book_down']-Point(135, 388)).get())
             my.wait(5)
-            locations = my_pygui.locateAllOnScreen('resource/task.png', confidence=0.9)
+            locations = my_pygui.locateAllOnScreen('task', confidence=0.9)
             if len(locations) == 0:
                 if ending:
                     if ending_retested:
@@ -754,19 +781,19 @@ class Adventure:
                 locations.sort(key=lambda i: -i.y)
                 loc = locations[0]
                 my_pygui.click((loc-Point(100, 0)).get())
-                loc = my_pygui.locateOnScreen('resource/start_adventure.png', confidence=0.9)
+                loc = my_pygui.locateOnScreen('start_adventure', confidence=0.9)
                 if loc is None:
                     raise Exception('Button not found.')
                 else:
                     my_pygui.click(loc.get())
                 my.wait(5)
-                loc = my_pygui.locateOnScreen('resource/confirm.png', confidence=0.9)
+                loc = my_pygui.locateOnScreen('confirm', confidence=0.9)
                 if loc is None:
                     continue
                 else:
                     my_pygui.click(loc.get())
-                    time.sleep(20)
-                    loc = my_pygui.locateOnScreen('resource/return.png'.format(self.name), confidence=0.9)
+                    my_pygui.clock.sleep(20)
+                    loc = my_pygui.locateOnScreen('return', confidence=0.9)
                     if loc is None:
                         raise Exception('Button not found.')
                     else:
@@ -776,43 +803,35 @@ class Adventure:
     def locate_reference_img(self, on_map):
         log.info('locate_reference_img')
         my_pygui.moveTo((self.coordinations['book'] + Point(100, 0)).get())
-        finded = my_pygui.locateOnScreen('data/{}/loc_reference.png'.format(self.name), confidence=0.85)
-        if finded:
-            if not on_map:
-                my_pygui.moveTo(Point.from_point(finded).get())
-                my_pygui.dragTo(self.coordinations['center_ref'].get())
-                finded = self.coordinations['center_ref']
-        else:
+        finded, scale = my_pygui.locateScaledOnScreen('adventure/loc_reference', REFERENCE_SCALES, confidence=0.85)
+        if not finded:
+            """reference out of the screen - zoom out and look again"""
             my_pygui.write('0-----')
-            import cv2
-            img = cv2.imread('data/{}/loc_reference.png'.format(self.name))
-            factor = 142 / 246
-            r_img = cv2.resize(img, (int(img.shape[1] * factor), int(img.shape[0] * factor)))
-            r_finded = my_pygui.locateOnScreen(r_img, confidence=0.65)
-            if r_finded:
-                my_pygui.moveTo(Point.from_point(r_finded).get())
-                my_pygui.dragTo(self.coordinations['center_ref'].get())
-                my_pygui.write('+++')
-                my_pygui.moveTo((self.coordinations['book'] + Point(100, 0)).get())
-                finded = my_pygui.locateOnScreen('data/{}/loc_reference.png'.format(self.name), confidence=0.85)
-            else:
+            finded, scale = my_pygui.locateScaledOnScreen('adventure/loc_reference', REFERENCE_SCALES,
+                                                          confidence=0.65)
+            if not finded:
                 raise Exception('data/{}/loc_reference.png not found on screen'.format(self.name))
+        zoom = round(math.log(scale, ZOOM_STEP))
+        if zoom or not on_map:
+            my_pygui.moveTo(finded.get())
+            my_pygui.dragTo(self.coordinations['center_ref'].get())
+            finded = self.coordinations['center_ref']
+        if zoom:
+            log.info('reference found {} zoom steps from default - zooming'.format(zoom))
+            my_pygui.write('+' * zoom if zoom > 0 else '-' * -zoom)
+            my_pygui.moveTo((self.coordinations['book'] + Point(100, 0)).get())
+            finded = my_pygui.locateOnScreen('adventure/loc_reference', confidence=0.85)
         return finded
 
     def verify_if_generals_active(self, action):
         log.info('verify_if_generals_active')
         self.open_star()
-        while True:
-            result = True
-            for general in action['generals']:
-                general_loc = self.generals_loc[general['id']]
-                result = result and self.verify_if_general_active(general_loc, general['type'])
-            if result:
-                log.info('all generals from this action active')
-                break
-            else:
-                log.info('not all generals from this action active - trying again')
-                my.wait(1, 'Trying again')
+        my_pygui.wait_until(lambda: all(self.verify_if_general_active(self.generals_loc[general['id']], general['type'])
+                                        for general in action['generals']),
+                            timeout=None,
+                            max_interval=3,
+                            name='generals_active')
+        log.info('all generals from this action active')
 
     @my.send_explorer_while_error
     def send_explorer_by_client(self, delay=0, template='explor'):
@@ -823,22 +842,22 @@ class Adventure:
             self.go_to_adventure()
         self.focus()
         my_pygui.hotkey('F3')
-        time.sleep(5)
-        loc = my_pygui.locateOnScreen('resource/read_template.png',
+        my_pygui.clock.sleep(5)
+        loc = my_pygui.locateOnScreen('read_template',
                                       confidence=0.85)
         if not loc:
             return
         my_pygui.click(loc.get())
-        time.sleep(3)
+        my_pygui.clock.sleep(3)
         my_pygui.write('{}.json'.format(template))
         my_pygui.hotkey('ENTER')
-        time.sleep(5)
-        loc = my_pygui.locateOnScreen('resource/send_by_client.png',
+        my_pygui.clock.sleep(5)
+        loc = my_pygui.locateOnScreen('send_by_client',
                                       confidence=0.85)
         my_pygui.click(loc.get())
         my_pygui.moveTo(100, 100)
-        time.sleep(5)
-        loc = my_pygui.locateOnScreen('resource/send_by_client.png',
+        my_pygui.clock.sleep(5)
+        loc = my_pygui.locateOnScreen('send_by_client',
                                       confidence=0.85)
         if loc:
             my_pygui.click((loc + Point(60, 0)).get())
@@ -849,22 +868,22 @@ class Adventure:
         my.wait(delay, 'Bufing')
         self.focus()
         my_pygui.hotkey('F5')
-        time.sleep(5)
-        loc = my_pygui.locateOnScreen('resource/read_template.png',
+        my_pygui.clock.sleep(5)
+        loc = my_pygui.locateOnScreen('read_template',
                                       confidence=0.85)
         if loc:
             my_pygui.click(loc.get())
-            time.sleep(3)
+            my_pygui.clock.sleep(3)
             my_pygui.write('{}.json'.format(template))
             my_pygui.hotkey('ENTER')
-            time.sleep(5)
-        loc = my_pygui.locateOnScreen('resource/send_by_client.png',
+            my_pygui.clock.sleep(5)
+        loc = my_pygui.locateOnScreen('send_by_client',
                                       confidence=0.85)
         if loc:
             my_pygui.click(loc.get())
         my_pygui.moveTo(100, 100)
-        time.sleep(5)
-        loc = my_pygui.locateOnScreen('resource/close_in_client.png',
+        my_pygui.clock.sleep(5)
+        loc = my_pygui.locateOnScreen('close_in_client',
                                       confidence=0.85)
         if loc:
             my_pygui.click((loc + Point(1, 0)).get())
@@ -873,7 +892,7 @@ class Adventure:
     def check_if_in_island(self):
         log.info('check_if_in_island')
 
-        loc = my_pygui.locateOnScreen('resource/in_island_PL.png'.format(self.name), confidence=0.99)
+        loc = my_pygui.locateOnScreen('in_island_PL', confidence=0.99)
         if loc is None:
             log.info('not_in_island')
             return False
@@ -885,26 +904,14 @@ class Adventure:
     def open_specialist_by_loc(spec_loc, verify=True):
         log.info('open_specialist_by_loc')
         my_pygui.click(spec_loc.get())
-        try_count = 0
-        while verify:
+        if verify:
             log.info('verify if specialist is open')
             # coc fixed - TODO
             region = (943, 380, 160, 125)
-            time.sleep(.5)
-            loc = my_pygui.locateOnScreen('resource/codex.png',
-                                          region=region,
-                                          confidence=0.85)
-            if loc:
-                log.info('specialist open verification succeed')
-                break
-            else:
-                log.info('specialist open verification false - trying again')
-                my.wait(try_count, 'specialist open verification false - trying again')
-                # my_pygui.click(spec_loc.get())
-                if try_count < 10:
-                    try_count += 1
-                else:
-                    raise Exception('specialist open verification failed in 10 tryes')
+            loc = my_pygui.wait_until_visible('codex', timeout=60, region=region, confidence=0.85)
+            if not loc:
+                raise Exception('specialist open verification failed in 60 s')
+            log.info('specialist open verification succeed')
 
     @my.send_explorer_while_error
     def send_explorer(self, delay=0, available_explorers=88, search=TreasureSearch.short):
@@ -937,21 +944,18 @@ class Adventure:
             # my_pygui.moveTo(self.coordinations['star'].x, self.coordinations['star'].y, 0.3)
 
             my.wait(3, "searching in")
-            locations = list(my_pygui.locateAllOnScreen('resource/gem.png',
-                                                        region=(star_window_cor.x, star_window_cor.y, 600, 400),
-                                                        confidence=0.97))
+            locations = my_pygui.locateAllOnScreen('gem',
+                                                   region=(star_window_cor.x, star_window_cor.y, 600, 400),
+                                                   confidence=0.97,
+                                                   nms=.3)
 
-            all_locations = [Point(first_gem.x + (co % 9) * 56,
-                                   first_gem.y + int(co / 9) * 70)
+            all_locations = [Point(first_gem.x + (co % 9) * SPECIALISTS_GRID[0],
+                                   first_gem.y + int(co / 9) * SPECIALISTS_GRID[1])
                              for co in range(explorers)]
             log.info('loactions:{}'.format(locations))
             log.info('all_loactions:{}'.format(all_locations))
-            # fix staranny and pirat gem loc
-            locations.extend([x - Point(0, 4) for x in locations] + [x - Point(4, 0) for x in locations])
-            # fix puszysty gem loc
-            locations.extend([x - Point(7, 5) for x in locations])
-            log.info('loactions:{}'.format(locations))
-            log.info('all_loactions:{}'.format(all_locations))
+            # gem of some explorers (staranny, pirat, puszysty) is shifted by up to (11, 9) px
+            locations = my_pygui.SpatialIndex(locations, radius=12)
 
             left_locations = [x for x in all_locations if x not in locations]
             left_locations.sort(key=lambda i: i.y)
@@ -961,16 +965,10 @@ class Adventure:
                 self.open_star()
                 self.open_specialist_by_loc(location)
 
-                treasure = True
-                if isinstance(search, TreasureSearch):
-                    my_pygui.click(self.coordinations['treasure']['open'].get())
-                    my_pygui.click(self.coordinations['treasure'][search.value].get())
-                    my_pygui.click(self.coordinations['treasure']['confirm'].get())
-                else:
-                    # if adv
-                    my_pygui.click(self.coordinations['adventure']['open'].get())
-                    my_pygui.click(self.coordinations['adventure'][search.value].get())
-                    my_pygui.click(self.coordinations['adventure']['confirm'].get())
+                buttons = self.coordinations['treasure' if isinstance(search, TreasureSearch) else 'adventure']
+                my_pygui.input_batch([('click', buttons['open'].get()),
+                                      ('click', buttons[search.value].get()),
+                                      ('click', buttons['confirm'].get())])
 
             self.open_star()
             if available_explorers < 1:
@@ -1000,12 +998,9 @@ class Adventure:
         elif mode == Mode.play:
             with open('data/{}/end_adv_co.json'.format(self.name), 'r') as f:
                 end_adventure_co = json.load(f)
-            for idx, click in enumerate(end_adventure_co):
-                target = Point.from_list(click['co']) + self.coordinations['center_ref']
-                if mode == Mode.play:
-                    my.wait(click['delay'], 'Click no ' + str(idx))
-                my_pygui.moveTo(target.get())
-                my_pygui.click(target.get(), clicks=1, interval=0.25)
+            # recorded delays are kept as minimum delays between the clicks
+            my_pygui.input_batch([('click', (Point.from_list(click['co']) + self.coordinations['center_ref']).get(),
+                                   click['delay']) for click in end_adventure_co])
 
     def focus_on_first_general(self):
         self.focus()
@@ -1025,7 +1020,7 @@ class Adventure:
     @staticmethod
     def c_load_army():
         log.info('c_load_army')
-        loc = my_pygui.locateOnScreen('resource/c_load.png',
+        loc = my_pygui.locateOnScreen('c_load',
                                       region=(1100, 900, 300, 100),
                                       confidence=0.90)
         if loc:
@@ -1038,7 +1033,7 @@ class Adventure:
     @staticmethod
     def c_send_army():
         log.info('c_send_army')
-        loc = my_pygui.locateOnScreen('resource/c_send.png',
+        loc = my_pygui.locateOnScreen('c_send',
                                       region=(1100, 800, 500, 200),
                                       confidence=0.90)
         if loc:
@@ -1052,7 +1047,7 @@ class Adventure:
     @staticmethod
     def c_move_army():
         log.info('c_move_army')
-        loc = my_pygui.locateOnScreen('resource/c_move.png',
+        loc = my_pygui.locateOnScreen('c_move',
                                       region=(1100, 800, 500, 200),
                                       confidence=0.90)
         if loc:
@@ -1065,7 +1060,7 @@ class Adventure:
     @staticmethod
     def c_attack_army():
         log.info('c_attack_army')
-        loc = my_pygui.locateOnScreen('resource/c_attack.png',
+        loc = my_pygui.locateOnScreen('c_attack',
                                       region=(1100, 800, 500, 200),
                                       confidence=0.90)
         if loc:
@@ -1090,24 +1085,28 @@ class Adventure:
         my.wait(2)
         my_pygui.hotkey('ctrl', 'pagedown')
         my.wait(5)
-        button_loc = self.c_button_search(action['type'])
         t_0 = time.time()
-        while not button_loc:
-            my.wait(10)
-            self.c_reset()
-            button_loc = self.c_button_search(action['type'])
+        button_loc = my_pygui.wait_until_visible('c_{}'.format(action['type']),
+                                                 timeout=None,
+                                                 max_interval=2,
+                                                 confidence=0.90,
+                                                 on_retry=self.c_reset,
+                                                 retry_every=10)
         t = time.time() - t_0
-        my_pygui.click(button_loc)
+        log.info('{} army button found - pending'.format(action['type']))
+        my_pygui.click(button_loc.get())
         # this is to wait/check if function succeed
-        while button_loc:
-            my.wait(10)
-            self.c_reset()
-            button_loc = self.c_button_search(action['type'])
+        my_pygui.wait_until_gone('c_{}'.format(action['type']),
+                                 timeout=None,
+                                 max_interval=2,
+                                 confidence=0.90,
+                                 on_retry=self.c_reset,
+                                 retry_every=10)
         self.c_data.update(dict(type=action['type'], file_loc=swap_text, delay=t))
 
     @staticmethod
     def c_button_search(action_type):
-        loc = my_pygui.locateOnScreen('resource/c_{}.png'.format(action_type),
+        loc = my_pygui.locateOnScreen('c_{}'.format(action_type),
                                       confidence=0.90)
         if loc:
             log.info('{} army button found - pending'.format(action_type))
@@ -1118,7 +1117,7 @@ class Adventure:
 
     @staticmethod
     def c_reset():
-        loc = my_pygui.locateOnScreen('resource/c_reset.png')
+        loc = my_pygui.locateOnScreen('c_reset')
         if loc:
             log.info('reset button found - pressing')
             my_pygui.click(loc.get())
@@ -1183,6 +1182,7 @@ def run(adv, adv_name, delay, gap, start=0, stop=999):
     adv.make_adventure(delay=delay, start=start, stop=stop, mode=Mode.play)
     adv.end_adventure(30, Mode.play)
     # adv.go_to_adventure(20)
+    engine.report()
     my.wait(30, 'waiting')
 
 
@@ -1248,46 +1248,49 @@ def buff(delay):
 # Adventure('bon').make_bonus(105*60, Mode.play)
 # Adventure('bon2').make_bonus(60*35, Mode.play)
 
-# adventure = 'DMK'
-adventure = 'Ali Baba Drwal'
-# adventure = 'Ali Baba i Drugi'
-# adventure = 'Ali Baba i Pierwszy'
-# adventure = 'Ali Baba i SM'
-# adventure = 'aaa'
-# adventure = 'proch'
-# adventure = 'piesni i klatwy'
-# adventure = 'banici'
-# adventure = 'smocza czat'
-# adventure = 'proch'
-# adventure = 'arktyczna'
-# adventure = 'cenne dane'
-# adventure = 'wyspa tikki'
-# adventure = 'uspiony wulkan'
-# adventure = 'wild_mary'
-TN = Adventure(adventure)
-# TN.start_adventure('lg_9')
-# TN.send_explorer_by_client(delay=3)
-# run(TN, 'banici', 3, 13*60)
-
-# Adventure('Home').make_adventure(delay=6*60)
-# TN.go_to_adventure(12*60)
-# TN.send_to_adventure(5, first=3, last=33)
-# run(TN, 'banici', 2, 18*60, stop=447)
-# TN.go_to_adventure(6)
-# TN.make_adventure(delay=6, start=0, stop=447, mode=Mode.play)
-# TN.end_adventure(10, Mode.play)
-# run(TN, 'arktyczna', 1, 10*60)
-# TN.make_adventure(delay=1, start=0, stop=117, mode=Mode.play)
-run(TN, 'drwal', delay=6, gap=0, start=0)
-TN.send_explorer_by_client(30)
-TN.buff_by_client(3)
-my.wait(17 * 60)
-while True:
-    TN.send_explorer_by_client(3)
-    TN.buff_by_client(3)
-    run(TN, 'drwal', 10, 16 * 60, stop=118)
-    TN.send_explorer_by_client(30)
-    my.wait(16 * 60)
+if __name__ == '__main__':
+    my_pygui.trace.open('save/trace.jsonl')
+    ocr.cache.open('save/ocr_cache.jsonl')
+    # adventure = 'DMK'
+    adventure = 'Ali Baba Drwal'
+    # adventure = 'Ali Baba i Drugi'
+    # adventure = 'Ali Baba i Pierwszy'
+    # adventure = 'Ali Baba i SM'
+    # adventure = 'aaa'
+    # adventure = 'proch'
+    # adventure = 'piesni i klatwy'
+    # adventure = 'banici'
+    # adventure = 'smocza czat'
+    # adventure = 'proch'
+    # adventure = 'arktyczna'
+    # adventure = 'cenne dane'
+    # adventure = 'wyspa tikki'
+    # adventure = 'uspiony wulkan'
+    # adventure = 'wild_mary'
+    TN = Adventure(adventure)
+    # TN.start_adventure('lg_9')
+    # TN.send_explorer_by_client(delay=3)
+    # run(TN, 'banici', 3, 13*60)
+
+    # Adventure('Home').make_adventure(delay=6*60)
+    # TN.go_to_adventure(12*60)
+    # TN.send_to_adventure(5, first=3, last=33)
+    # run(TN, 'banici', 2, 18*60, stop=447)
+    # TN.go_to_adventure(6)
+    # TN.make_adventure(delay=6, start=0, stop=447, mode=Mode.play)
+    # TN.end_adventure(10, Mode.play)
+    # run(TN, 'arktyczna', 1, 10*60)
+    # TN.make_adventure(delay=1, start=0, stop=117, mode=Mode.play)
+    # run(TN, 'drwal', delay=6, gap=0, start=0)
+    # explorers, buffs and tasks are serviced by the engine between adventure actions
+    island = engine.Engine(TN)
+
+    async def drwal():
+        await island.adventures('drwal', delay=6, gap=0, start=0)
+        while True:
+            await island.sleep_until(my_pygui.clock.monotonic() + 16 * 60)
+            await island.adventures('drwal', 10, 16 * 60, stop=118)
+    island.run(drwal())
     # adventure = 'Ali Baba Drwal'
     # TN = Adventure(adventure)
     # Adventure('WW_').make_adventure(delay=15*60)
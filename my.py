@@ -1,3 +1,4 @@
+import functools
 import os
 import time
 import json
@@ -25,6 +26,9 @@ def get_last_filename(name, path='data/{}/learned'):
 
 
 def wait(delay=0, info=''):
+    if my_pygui.clock.virtual:
+        my_pygui.clock.sleep(delay)
+        return
     start = time.time()
     count = delay
     while time.time() - start < delay:
@@ -149,6 +153,7 @@ def close_not_responding_windows():
 
 
 def send_explorer_while_error(func):
+    @functools.wraps(func)
     def wrapper_send_explorer_while_error(*args, **kwargs):
         try:
             return func(*args, **kwargs)
@@ -1,7 +1,21 @@
 import pyautogui
+import atexit
 import logging
+import hashlib
+import json
+import os
 import sys
-from my_types import Point, Box
+import threading
+import time
+import numpy as np
+import cv2 as cv
+from PIL import Image
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from my_types import Point, Box, Hit
+from tracer import trace
+from latency import latency
+import capture
 
 if sys.platform == 'win32':
     # this is to fix memory liking in windows, in original pyautogui.pixel function
@@ -30,62 +44,723 @@ if sys.platform == 'win32':
 
     pyautogui.pixelMatchesColor = _pixelMatchesColor
 
-pyautogui.PAUSE = .7
+pyautogui.PAUSE = 0
+
+
+class Clock:
+    """Time source of my_pygui and my.wait. Virtual clock does not sleep, it only moves its time forward
+    (headless replays and benchmarks)"""
+    def __init__(self):
+        self.virtual = False
+        self.offset = 0.
+
+    def time(self):
+        return time.time() + self.offset
+
+    def monotonic(self):
+        return time.monotonic() + self.offset
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.virtual:
+            self.offset += seconds
+        else:
+            time.sleep(seconds)
+
+
+clock = Clock()
+# executes mouse and keyboard input - pyautogui, or replay.Replay in headless runs
+input_backend = pyautogui
+
+
+def set_input_backend(backend=None):
+    global input_backend
+    input_backend = backend or pyautogui
+
+
+# callables observer(kind, data) notified about results of locate calls (recorder.Recorder)
+observers = []
+
+
+def _observe(kind, **data):
+    for observer in observers:
+        observer(kind, data)
+
+
+class InputPacer:
+    """Paces mouse and keyboard input instead of fixed pyautogui.PAUSE after every call.
+    Per action type (click, move, write, press, hotkey, scroll, drag) is configured:
+    gap - minimum time between the previous input and this one,
+    settle - minimum time between this input and the next screen capture (frame_cache waits for it),
+    react - if set, after the input waits (up to react seconds) until screen around the input position changes.
+    Time spent in pacing is compared with the fixed pauses, the old code paid (report)."""
+    # seconds of pyautogui.PAUSE paid by every action before pacing (Click used .3 for move and click)
+    LEGACY = {'click': .6, 'move': .7, 'write': .7, 'press': .7, 'hotkey': .7, 'scroll': .7, 'drag': .7}
+
+    def __init__(self, hover=.05, react_radius=60):
+        self.hover = hover
+        self.react_radius = react_radius
+        self.actions = {'click': {'gap': .15, 'settle': .3, 'react': None},
+                        'move': {'gap': .05, 'settle': .1, 'react': None},
+                        'write': {'gap': .1, 'settle': .2, 'react': None},
+                        'press': {'gap': .15, 'settle': .3, 'react': None},
+                        'hotkey': {'gap': .2, 'settle': .4, 'react': None},
+                        'scroll': {'gap': .2, 'settle': .4, 'react': None},
+                        'drag': {'gap': .2, 'settle': .3, 'react': None}}
+        self.counts = dict()
+        self.spent = 0.
+        self.legacy = 0.
+        self._last = 0
+        self._ready_at = 0
+
+    def configure(self, action, **kwargs):
+        """sets gap, settle and/or react of action type"""
+        unknown = set(kwargs) - {'gap', 'settle', 'react'}
+        if unknown:
+            raise KeyError('Unknown pacing options {}'.format(unknown))
+        self.actions.setdefault(action, {'gap': 0, 'settle': 0, 'react': None}).update(kwargs)
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            clock.sleep(seconds)
+            self.spent += seconds
+
+    def wait_ready(self):
+        """waits until the last input settled - called before every screen capture"""
+        self._sleep(self._ready_at - clock.time())
+
+    def __call__(self, action, position=None):
+        return _Paced(self, action, position)
+
+    def wait_gap(self, action, gap=None):
+        """waits until gap (default - gap of action type) since the previous input passed"""
+        self._sleep(self._last + (self.actions[action]['gap'] if gap is None else gap) - clock.time())
+
+    def before(self, action, position=None):
+        config = self.actions[action]
+        self.wait_gap(action)
+        if config['react'] and position is not None:
+            return self._react_region(position), frame_cache.region(self._react_region(position))[0].copy()
+        return None
+
+    def after(self, action, watched=None):
+        config = self.actions[action]
+        now = clock.time()
+        self._last = now
+        self._ready_at = now + config['settle']
+        self.counts[action] = self.counts.get(action, 0) + 1
+        self.legacy += self.LEGACY.get(action, 0)
+        frame_cache.invalidate()
+        if watched:
+            region, before = watched
+            start = clock.time()
+            wait_until(lambda: not np.array_equal(before, frame_cache.region(region)[0]), config['react'],
+                       interval=.05, max_interval=.2, name='react ' + action)
+            self.spent += clock.time() - start
+
+    def _react_region(self, position):
+        x, y = (int(i) for i in position[:2])
+        r = self.react_radius
+        return x - r, y - r, 2 * r, 2 * r
+
+    def report(self):
+        return {'inputs': dict(self.counts),
+                'paced': round(self.spent, 2),
+                'fixed_pause': round(self.legacy, 2),
+                'saved': round(self.legacy - self.spent, 2)}
+
+
+class _Paced:
+    def __init__(self, pacer, action, position):
+        self.pacer = pacer
+        self.action = action
+        self.position = position
+
+    def __enter__(self):
+        self.watched = self.pacer.before(self.action, self.position)
+
+    def __exit__(self, *exc):
+        self.pacer.after(self.action, self.watched)
+        return False
+
+
+def _position(args):
+    """return (x, y) of input given by pyautogui-like args, or None if not given"""
+    if args and hasattr(args[0], 'x'):
+        return args[0].x, args[0].y
+    if args and isinstance(args[0], (tuple, list)) and len(args[0]) >= 2:
+        return args[0][:2]
+    if len(args) >= 2 and all(isinstance(i, (int, float)) for i in args[:2]):
+        return args[:2]
+    return None
+
+
+pacer = InputPacer()
+
+
+class FrameCache:
+    """Keeps last screen captures (BGR numpy arrays), so locate and pixel calls made within max_age seconds
+    share one screenshot. Small regions (up to region_limit of the screen) are grabbed alone, unless there is
+    fresh full frame to take them from. Any mouse or keyboard input invalidates the captures.
+    Captures are made by backend (see capture.py), returned arrays may be views on backend's buffers."""
+    def __init__(self, backend=None, max_age=.5, region_limit=.25):
+        self._backend = backend
+        self.max_age = max_age
+        self.region_limit = region_limit
+        self.hits = 0
+        self.misses = 0
+        self.region_grabs = 0
+        self._frame = None
+        self._taken = 0
+        self._regions = dict()
+        self._size = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = capture.default_backend()
+        return self._backend
+
+    def set_backend(self, backend, close_previous=True):
+        with self._lock:
+            if close_previous and self._backend is not None and self._backend is not backend:
+                self._backend.close()
+            self._backend = backend
+            self._size = None
+            self.invalidate()
+
+    def size(self):
+        """return (width, height) of the screen"""
+        if self._size is None:
+            self._size = tuple(self.backend.size())
+        return self._size
+
+    def get(self, region=None):
+        """return cached frame (or its region view), capturing new one if the cached is stale"""
+        with self._lock:
+            if self._frame is None or clock.time() - self._taken > self.max_age:
+                pacer.wait_ready()
+                self._frame = self.backend.grab()
+                self._taken = clock.time()
+                self._size = self._frame.shape[1], self._frame.shape[0]
+                self.misses += 1
+            else:
+                self.hits += 1
+            frame = self._frame
+        if region is None:
+            return frame
+        x, y, w, h = region
+        return frame[y:y + h, x:x + w]
+
+    def region(self, region=None):
+        """return (view, clipped region) - region of fresh full frame if there is one, otherwise region
+        grabbed alone (if small enough)"""
+        region = _clip_region(region, self.size())
+        x, y, w, h = region
+        screen_w, screen_h = self.size()
+        with self._lock:
+            now = clock.time()
+            fresh = self._frame is not None and now - self._taken <= self.max_age
+            if not fresh and w * h <= self.region_limit * screen_w * screen_h:
+                cached = self._regions.get(region)
+                if cached is not None and now - cached[0] <= self.max_age:
+                    self.hits += 1
+                    return cached[1], region
+                pacer.wait_ready()
+                view = self.backend.grab(region)
+                self._regions[region] = (clock.time(), view)
+                self.region_grabs += 1
+                self.misses += 1
+                return view, region
+        return self.get(region), region
+
+    def invalidate(self):
+        self._frame = None
+        self._regions = dict()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'region_grabs': self.region_grabs,
+                'hit_ratio': self.hits / total if total else 0.}
+
+
+frame_cache = FrameCache()
+
+
+class Template:
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+        self.color = cv.imread(path, cv.IMREAD_COLOR)
+        if self.color is None:
+            raise IOError('Failed to read {} because file is missing, has improper permissions, '
+                          'or is an unsupported or invalid format'.format(path))
+        self.gray = cv.cvtColor(self.color, cv.COLOR_BGR2GRAY)
+
+    @property
+    def nbytes(self):
+        return self.color.nbytes + self.gray.nbytes
+
+
+class Templates:
+    """Registry of decoded template images.
+    Key is the path relative to loaded directory without extension (e.g. 'transfer', 'collectables/...'),
+    templates of active adventure are under 'adventure/' prefix. File paths are accepted as well."""
+    def __init__(self):
+        self._by_key = dict()
+        self._by_path = dict()
+        self.load_time = 0.
+        self.lazy_loads = 0
+
+    def add(self, key, path):
+        t0 = time.time()
+        template = Template(key, path)
+        self.load_time += time.time() - t0
+        old = self._by_key.get(key)
+        if old:
+            del self._by_path[old.path]
+        self._by_key[key] = template
+        self._by_path[template.path] = template
+        return template
+
+    def load_dir(self, directory='resource', prefix=''):
+        """loads every png from directory (with subdirectories)"""
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.lower().endswith('.png'):
+                    path = os.path.normpath(os.path.join(root, file))
+                    key = os.path.splitext(os.path.relpath(path, directory))[0].replace(os.sep, '/')
+                    self.add(prefix + key, path)
+        trace('Templates', directory, self.stats())
+
+    def load_adventure(self, name):
+        """loads templates of adventure 'name' under 'adventure/' prefix, replacing previous adventure"""
+        for key in [key for key in self._by_key if key.startswith('adventure/')]:
+            del self._by_path[self._by_key.pop(key).path]
+        for file in ('loc_reference.png', 'goto_adv.png', 'start_adv.png'):
+            path = os.path.normpath(os.path.join('data', name, file))
+            if os.path.exists(path):
+                self.add('adventure/' + os.path.splitext(file)[0], path)
+
+    def get(self, key_or_path):
+        template = self._by_key.get(key_or_path) or self._by_path.get(os.path.normpath(key_or_path))
+        if template is None:
+            if not os.path.exists(key_or_path):
+                raise KeyError('No template {}'.format(key_or_path))
+            self.lazy_loads += 1
+            template = self.add(os.path.normpath(key_or_path), os.path.normpath(key_or_path))
+        return template
+
+    def __contains__(self, key):
+        return key in self._by_key
+
+    def stats(self):
+        return {'templates': len(self._by_key),
+                'bytes': sum(template.nbytes for template in self._by_key.values()),
+                'load_time': self.load_time,
+                'lazy_loads': self.lazy_loads}
+
+
+templates = Templates()
+
+
+class HotRegions:
+    """Remembers box where each template was last found, so locateOnScreen searches small window around it
+    first, and the whole region only on a miss. Kept per adventure and screen resolution in
+    data/<adventure>/hot_regions_<width>x<height>.json - changed boxes are written at most every save_every
+    seconds (and at exit), not on every locate"""
+    def __init__(self, margin=20, save_every=60.):
+        self.margin = margin
+        self.save_every = save_every
+        self.path = None
+        self.fast_hits = 0
+        self.fast_misses = 0
+        self._boxes = dict()
+        self._dirty = False
+        self._saved = time.time()
+        atexit.register(self.save)
+
+    def load(self, name):
+        self.save()
+        width, height = frame_cache.size()
+        self.path = os.path.join('data', name, 'hot_regions_{}x{}.json'.format(width, height))
+        self._boxes = dict()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._boxes = json.load(f)
+
+    def save(self):
+        """writes boxes, if changed since the last save"""
+        if self.path and self._dirty:
+            with open(self.path, 'w') as f:
+                json.dump(self._boxes, f, indent=2)
+        self._dirty = False
+        self._saved = time.time()
+
+    def window(self, key, region=None):
+        """return window (x, y, w, h) around last location of template key, cut to region,
+        or None if template was not found yet (or last location is out of region)"""
+        box = self._boxes.get(key)
+        if box is None:
+            return None
+        x0, y0 = box[0] - self.margin, box[1] - self.margin
+        x1, y1 = box[0] + box[2] + self.margin, box[1] + box[3] + self.margin
+        if region is not None:
+            x0, y0 = max(x0, region[0]), max(y0, region[1])
+            x1, y1 = min(x1, region[0] + region[2]), min(y1, region[1] + region[3])
+        if x1 - x0 < box[2] or y1 - y0 < box[3]:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+    def update(self, key, box):
+        box = [int(i) for i in box[:4]]
+        if self._boxes.get(key) != box:
+            self._boxes[key] = box
+            self._dirty = True
+            if time.time() - self._saved > self.save_every:
+                self.save()
+
+    def stats(self):
+        total = self.fast_hits + self.fast_misses
+        return {'fast_hits': self.fast_hits,
+                'fast_misses': self.fast_misses,
+                'fast_ratio': self.fast_hits / total if total else 0.}
+
+
+hot_regions = HotRegions()
+
+
+class ChangeDetector:
+    """Fingerprints searched regions of captured frames. Locate of template in a region, which has not changed
+    since the last locate with the same arguments, returns memoised result without matching.
+    Times of changes are logged per region (change_log), wait_for_change waits for the next one.
+    tolerance 0 - fingerprint is exact hash of pixels, otherwise mean absolute difference of 8x downscaled
+    grayscale thumbnails has to exceed tolerance to count as change."""
+    def __init__(self, tolerance=0, memo_size=256, log_size=100):
+        self.tolerance = tolerance
+        self.memo_size = memo_size
+        self.log_size = log_size
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._last = dict()
+        self._log = dict()
+        self._lock = threading.Lock()
+
+    def fingerprint(self, view):
+        h, w = view.shape[:2]
+        if not self.tolerance:
+            return hashlib.blake2b(np.ascontiguousarray(view).data, digest_size=16).digest()
+        gray = cv.cvtColor(view, cv.COLOR_BGR2GRAY) if len(view.shape) == 3 else view
+        return cv.resize(gray, (max(w // 8, 1), max(h // 8, 1)), interpolation=cv.INTER_AREA)
+
+    def same(self, first, second):
+        if isinstance(first, bytes) or isinstance(second, bytes):
+            return isinstance(first, bytes) and isinstance(second, bytes) and first == second
+        if first is None or second is None or first.shape != second.shape:
+            return False
+        return np.abs(first.astype(int) - second).mean() <= self.tolerance
+
+    def check(self, view, region):
+        """return fingerprint of region (view), logging a change if region differs from the last check"""
+        fingerprint = self.fingerprint(view)
+        with self._lock:
+            if not self.same(self._last.get(region), fingerprint):
+                self._log.setdefault(region, deque(maxlen=self.log_size)).append(clock.time())
+            self._last[region] = fingerprint
+        return fingerprint
+
+    def memoised(self, key, region, locate_function):
+        """return result of locate_function for key in region, from memo if region has not changed"""
+        view, region = frame_cache.region(region)
+        fingerprint = self.check(view, region)
+        key = key + (region,)
+        with self._lock:
+            memo = self._memo.get(key)
+            if memo and self.same(memo[0], fingerprint):
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return list(memo[1])
+            self.misses += 1
+        result = locate_function()
+        with self._lock:
+            self._memo[key] = (fingerprint, list(result))
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return result
+
+    def change_log(self, region):
+        """return times of changes of (clipped) region noticed so far"""
+        return list(self._log.get(tuple(region), ()))
+
+    def wait_for_change(self, region=None, timeout=60, **kwargs):
+        """waits until region differs from its current state, returns True or None on timeout"""
+        view, region = frame_cache.region(region)
+        start = self.check(view, region)
+        return wait_until(lambda: not self.same(start, self.check(*frame_cache.region(region))), timeout,
+                          name='change {}'.format(region), **kwargs)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'memo_hits': self.hits,
+                'memo_misses': self.misses,
+                'memo_ratio': self.hits / total if total else 0.,
+                'regions': len(self._last)}
+
+
+change_detector = ChangeDetector()
+
+
+def _memo_key(name, needle, kwargs):
+    """return memo key of locate call, or None if it can not be memoised (needle given as image)"""
+    if not isinstance(needle, str):
+        return None
+    return (name, needle) + tuple((key, tuple(value) if isinstance(value, list) else value)
+                                  for key, value in sorted(kwargs.items()) if key != 'region')
+
+
+def _needle(needle, grayscale=False):
+    """return decoded template image for template key or path, numpy arrays are returned as they are"""
+    if isinstance(needle, str):
+        template = templates.get(needle)
+        return template.gray if grayscale else template.color
+    return needle
+
+
+def _clip_region(region, size):
+    """return region (x, y, w, h) cut to the screen of size (width, height)"""
+    width, height = size
+    if region is None:
+        return 0, 0, width, height
+    x, y, w, h = (int(i) for i in region)
+    x0, y0 = max(x, 0), max(y, 0)
+    return x0, y0, max(min(x + w, width) - x0, 0), max(min(y + h, height) - y0, 0)
+
+
+def _haystack(image, grayscale=False):
+    """return BGR (or gray) numpy array from file path, PIL image or numpy array"""
+    if isinstance(image, str):
+        image = cv.imread(image, cv.IMREAD_COLOR)
+    elif not isinstance(image, np.ndarray):
+        image = cv.cvtColor(np.array(image.convert('RGB')), cv.COLOR_RGB2BGR)
+    if grayscale and len(image.shape) == 3:
+        image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    return image
+
+
+def _match_template(needle, haystack, confidence):
+    """return list of (x, y, score) of needle top-left corners in haystack, matched with at least confidence"""
+    if needle.shape[0] > haystack.shape[0] or needle.shape[1] > haystack.shape[1]:
+        return []
+    result = cv.matchTemplate(haystack, needle, cv.TM_CCOEFF_NORMED)
+    ys, xs = np.nonzero(result >= confidence)
+    return list(zip(xs.tolist(), ys.tolist(), result[ys, xs].tolist()))
+
+
+def _match_boxes(needle, haystack, confidence=.999, grayscale=False, limit=None, offset=(0, 0)):
+    """return boxes (x, y, w, h, score) of needle found in haystack (in raster order), moved by offset"""
+    needle = _needle(needle, grayscale)
+    haystack = _haystack(haystack, grayscale)
+    n_h, n_w = needle.shape[:2]
+    matches = _match_template(needle, haystack, confidence)[:limit]
+    return [(m_x + offset[0], m_y + offset[1], n_w, n_h, score) for m_x, m_y, score in matches]
+
+
+def _locate_in_frame(needle, region=None, **kwargs):
+    """locates needle in cached frame, returns boxes (x, y, w, h, score) in screen coordinates"""
+    view, (x, y, w, h) = frame_cache.region(region)
+    return _match_boxes(needle, view, offset=(x, y), **kwargs)
+
+
+_pool = None
+
+
+def _worker_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix='match')
+    return _pool
+
+
+def _non_max_suppression(boxes, overlap=.3):
+    """return boxes ordered by score, without those overlapping (IoU > overlap) better scored ones"""
+    if not boxes:
+        return []
+    array = np.array([box[:5] for box in boxes], dtype=float)
+    x1, y1 = array[:, 0], array[:, 1]
+    x2, y2 = x1 + array[:, 2], y1 + array[:, 3]
+    areas = array[:, 2] * array[:, 3]
+    order = np.argsort(-array[:, 4], kind='stable')
+    kept = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        kept.append(boxes[i])
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        intersection = w * h
+        order = rest[intersection / (areas[i] + areas[rest] - intersection) <= overlap]
+    return kept
+
+
+def _snap_to_grid(boxes, grid):
+    """moves box centers to the nearest node of grid (step_x, step_y) anchored in the best scored box center,
+    keeping only best box per node. Boxes have to be ordered by score."""
+    if not boxes:
+        return []
+    step_x, step_y = grid
+    anchor_x, anchor_y = boxes[0][0] + boxes[0][2] / 2, boxes[0][1] + boxes[0][3] / 2
+    nodes = dict()
+    for box in boxes:
+        x, y, w, h = box[:4]
+        node = (round((x + w / 2 - anchor_x) / step_x) if step_x else x + w / 2 - anchor_x,
+                round((y + h / 2 - anchor_y) / step_y) if step_y else y + h / 2 - anchor_y)
+        if node not in nodes:
+            c_x = anchor_x + node[0] * step_x if step_x else x + w / 2
+            c_y = anchor_y + node[1] * step_y if step_y else y + h / 2
+            nodes[node] = (c_x - w / 2, c_y - h / 2) + tuple(box[2:])
+    return list(nodes.values())
+
+
+def _clean_boxes(boxes, nms=None, grid=None):
+    """optional non-maximum suppression (nms = IoU threshold) and grid snapping, result in raster order"""
+    if nms is None and grid is None:
+        return boxes
+    boxes = _non_max_suppression(boxes, .3 if nms is None else nms)
+    if grid:
+        boxes = _snap_to_grid(boxes, grid)
+    boxes.sort(key=lambda i: (i[1] + i[3] / 2, i[0] + i[2] / 2))
+    return boxes
+
+
+def _to_result(box, center, label=None):
+    """box (x, y, w, h, score[, label]) as Hit (center) or Box"""
+    if center:
+        label = box[5] if len(box) > 5 else label
+        return Hit(box[0] + box[2] / 2, box[1] + box[3] / 2, label, box[4], box[2], box[3])
+    return Box.from_box(box)
+
+
+_pyramid = dict()
+
+
+def _scaled_needle(needle, scale, grayscale=False):
+    """return template resized by scale, templates given by key or path are resized only once"""
+    if scale == 1:
+        return _needle(needle, grayscale)
+    key = (needle, scale, grayscale) if isinstance(needle, str) else None
+    if key not in _pyramid:
+        image = _needle(needle, grayscale)
+        size = (max(int(round(image.shape[1] * scale)), 1), max(int(round(image.shape[0] * scale)), 1))
+        resized = cv.resize(image, size, interpolation=cv.INTER_AREA if scale < 1 else cv.INTER_LINEAR)
+        if key is None:
+            return resized
+        _pyramid[key] = resized
+    return _pyramid[key]
+
+
+def _best_locations(result, count, min_distance):
+    """return up to count (score, x, y) of best, separated by min_distance, maxima of matchTemplate result"""
+    result = result.copy()
+    locations = []
+    for _ in range(count):
+        _, score, _, (x, y) = cv.minMaxLoc(result)
+        if not np.isfinite(score):
+            break
+        locations.append((score, x, y))
+        result[max(y - min_distance, 0):y + min_distance + 1, max(x - min_distance, 0):x + min_distance + 1] = -1
+    return locations
+
+
+class SpatialIndex:
+    """Hits bucketed in square cells, to check in constant time if there is a hit near some point"""
+    def __init__(self, points, radius=8):
+        self.radius = radius
+        self._cells = dict()
+        for point in points:
+            self._cells.setdefault(self._cell(point), []).append(point)
+
+    def _cell(self, point):
+        return point.x // self.radius, point.y // self.radius
+
+    def near(self, point):
+        """return first hit not further than radius (in each axis) from point, or None"""
+        c_x, c_y = self._cell(point)
+        for d_x in (-1, 0, 1):
+            for d_y in (-1, 0, 1):
+                for hit in self._cells.get((c_x + d_x, c_y + d_y), ()):
+                    if abs(hit.x - point.x) <= self.radius and abs(hit.y - point.y) <= self.radius:
+                        return hit
+        return None
+
+    def __contains__(self, point):
+        return self.near(point) is not None
+
+
+def _pixel_matches_color(frame, x, y, expectedRGBColor, tolerance=0):
+    b, g, r = (int(i) for i in frame[y, x])
+    exR, exG, exB = expectedRGBColor[:3]
+    return (abs(r - exR) <= tolerance) and (abs(g - exG) <= tolerance) and (abs(b - exB) <= tolerance)
 
 
 class Click:
     def __call__(self, *args, **kwargs):
-        logging.info('Click: {}, {}'.format(args, kwargs))
-        pyautogui.PAUSE = .3
-        pyautogui.moveTo(*args)
-        result = pyautogui.click(*args, **kwargs)
-        pyautogui.PAUSE = .7
+        trace('Click', args, kwargs)
+        with pacer('click', _position(args)):
+            input_backend.moveTo(*args)
+            clock.sleep(pacer.hover)
+            result = input_backend.click(*args, **kwargs)
         return result
 
 
 class Write:
     def __call__(self, *args, **kwargs):
-        logging.info('Write: {}, {}'.format(args, kwargs))
-        return pyautogui.write(*args, **kwargs)
+        trace('Write', args, kwargs)
+        with pacer('write'):
+            result = input_backend.write(*args, **kwargs)
+        return result
 
 
 class Center:
     def __call__(self, *args, **kwargs):
-        logging.info('Center: {}, {}'.format(args, kwargs))
+        trace('Center', args, kwargs)
         return Point(args[0].x + int(args[0].w / 2), args[0].y + int(args[0].h / 2))
 
 
 class Locateallonscreen:
+    """nms - IoU threshold of non-maximum suppression (one hit per object),
+    grid - (step_x, step_y) to snap hits to, keeping one per grid node"""
     def __call__(self, *args, **kwargs):
-        center_ = True
-        if 'center' in kwargs:
-            center_ = kwargs.pop('center')
-        logging.info('Locateallonscreen: {}, {}'.format(args, kwargs))
-        boxes = pyautogui.locateAllOnScreen(*args, **kwargs)
-        if boxes:
-            if center_:
-                return [Point.from_box_center(box) for box in boxes]
-            else:
-                return [Box.from_box(box) for box in boxes]
+        center_ = kwargs.pop('center', True)
+        nms = kwargs.pop('nms', None)
+        grid = kwargs.pop('grid', None)
+        trace('Locateallonscreen', args, kwargs)
+        key = _memo_key('all', args[0], dict(kwargs, nms=nms, grid=grid))
+        if key:
+            boxes = change_detector.memoised(key, kwargs.get('region'),
+                                             lambda: _clean_boxes(_locate_in_frame(*args, **kwargs), nms, grid))
         else:
-            return None
+            boxes = _clean_boxes(_locate_in_frame(*args, **kwargs), nms, grid)
+        label = args[0] if isinstance(args[0], str) else None
+        result = [_to_result(box, center_, label) for box in boxes]
+        _observe('locate_all', needle=label, region=kwargs.get('region'), result=result)
+        return result
 
 
 class Locateall:
     def __call__(self, *args, **kwargs):
-        center_ = True
-        if 'center' in kwargs:
-            center_ = kwargs.pop('center')
-        logging.info('Locateall: {}, {}'.format(args, kwargs))
-        boxes = pyautogui.locateAll(*args, **kwargs)
-        if boxes:
-            if center_:
-                result = [Point.from_box_center(box) for box in boxes]
-            else:
-                result = [Box.from_box(box) for box in boxes]
-        else:
-            result = None
-        logging.info('_Locateall: {}'.format(result))
+        center_ = kwargs.pop('center', True)
+        nms = kwargs.pop('nms', None)
+        grid = kwargs.pop('grid', None)
+        trace('Locateall', args, kwargs)
+        boxes = _clean_boxes(_match_boxes(*args, **kwargs), nms, grid)
+        label = args[0] if isinstance(args[0], str) else None
+        result = [_to_result(box, center_, label) for box in boxes]
+        trace('_Locateall', result)
         return result
 
 
@@ -94,16 +769,30 @@ class Locateonscreen:
         center_ = True
         if 'center' in kwargs:
             center_ = kwargs.pop('center')
-        logging.info('Locateonscreen: {}, {}'.format(args, kwargs))
-        box = pyautogui.locateOnScreen(*args, **kwargs)
-        if box:
-            if center_:
-                result = Point.from_box_center(box)
-            else:
-                result = Box.from_box(box)
+        trace('Locateonscreen', args, kwargs)
+        key = args[0] if isinstance(args[0], str) else None
+        region = kwargs.pop('region', None)
+
+        def locate():
+            hot = hot_regions.window(key, region) if key else None
+            if hot:
+                found = _locate_in_frame(*args, region=hot, limit=1, **kwargs)
+                if found:
+                    hot_regions.fast_hits += 1
+                    return found
+                hot_regions.fast_misses += 1
+            return _locate_in_frame(*args, region=region, limit=1, **kwargs)
+
+        memo_key = _memo_key('one', key, kwargs)
+        boxes = change_detector.memoised(memo_key, region, locate) if memo_key else locate()
+        if boxes:
+            if key:
+                hot_regions.update(key, boxes[0])
+            result = _to_result(boxes[0], center_, key)
         else:
             result = None
-        logging.info('_Locateonscreen: {}'.format(result))
+        trace('_Locateonscreen', result)
+        _observe('locate', needle=key, region=region, result=result)
         return result
 
 
@@ -112,95 +801,373 @@ class Locate:
         center_ = True
         if 'center' in kwargs:
             center_ = kwargs.pop('center')
-        logging.info('Locate: {}, {}'.format(args, kwargs))
-        box = pyautogui.locate(*args, **kwargs)
-        if box:
-            if center_:
-                result = Point.from_box_center(box)
-            else:
-                result = Box.from_box(box)
+        trace('Locate', args, kwargs)
+        boxes = _match_boxes(*args, limit=1, **kwargs)
+        if boxes:
+            result = _to_result(boxes[0], center_, args[0] if isinstance(args[0], str) else None)
         else:
             result = None
-        logging.info('_Locate: {}'.format(result))
+        trace('_Locate', result)
+        return result
+
+
+class Locatetemplatesonscreen:
+    """Locates many templates in one captured region. Templates are given as {label: key or list of keys}
+    (or just list of keys, label = key). Every template is matched on a worker pool against the same
+    (once converted) frame, returns list of labelled Hits in raster order, with overlapping hits
+    (IoU > nms) suppressed. grid as in locateAllOnScreen."""
+    def __call__(self, needles, region=None, confidence=.999, grayscale=False, nms=.3, grid=None):
+        trace('Locatetemplatesonscreen', needles, region, confidence)
+        if not isinstance(needles, dict):
+            needles = dict((key, key) for key in needles)
+        view, (x, y, w, h) = frame_cache.region(region)
+        haystack = _haystack(view, grayscale)
+        jobs = []
+        for label, keys in needles.items():
+            for key in ([keys] if isinstance(keys, str) else keys):
+                jobs.append((label, _worker_pool().submit(_match_boxes, key, haystack, confidence, grayscale,
+                                                          offset=(x, y))))
+        boxes = []
+        for label, job in jobs:
+            boxes.extend(box + (label,) for box in job.result())
+        result = [_to_result(box, True) for box in _clean_boxes(boxes, nms, grid)]
+        trace('_Locatetemplatesonscreen', result)
+        _observe('locate_templates', needle=list(needles), region=region, result=result)
         return result
 
 
+class Locatescaledonscreen:
+    """Locates template shown in unknown scale (e.g. game zoom). Every scale of the template is first matched
+    in coarse (downscaled by factor coarse) frame, then only the best candidates are refined in full resolution.
+    Returns (Hit, scale) of the best match, or (None, None)."""
+    def __call__(self, needle, scales=(1.,), region=None, confidence=.85, grayscale=False, coarse=.25,
+                 candidates=3):
+        trace('Locatescaledonscreen', needle, scales, region, confidence)
+        view, (x, y, w, h) = frame_cache.region(region)
+        haystack = _haystack(view, grayscale)
+        small_haystack = cv.resize(haystack, None, fx=coarse, fy=coarse, interpolation=cv.INTER_AREA)
+        found = []
+        for scale in scales:
+            scaled = _scaled_needle(needle, scale, grayscale)
+            n_h, n_w = scaled.shape[:2]
+            if n_h > h or n_w > w:
+                continue
+            small = _scaled_needle(needle, scale * coarse, grayscale)
+            if min(small.shape[:2]) < 8:
+                # too small to be matched in coarse frame - candidate is the whole region
+                found.append((1., scale, 0, 0, w, h))
+                continue
+            result = cv.matchTemplate(small_haystack, small, cv.TM_CCOEFF_NORMED)
+            margin = int(2 / coarse) + 2
+            for score, s_x, s_y in _best_locations(result, candidates, max(min(small.shape[:2]) // 2, 1)):
+                # coarse matching is less accurate - keep candidates with lower score for refining
+                if score >= confidence - .2:
+                    found.append((score, scale, int(s_x / coarse) - margin, int(s_y / coarse) - margin,
+                                  n_w + 2 * margin, n_h + 2 * margin))
+        found.sort(key=lambda i: -i[0])
+        best, best_scale = None, None
+        for _, scale, c_x, c_y, c_w, c_h in found[:candidates]:
+            scaled = _scaled_needle(needle, scale, grayscale)
+            c_x, c_y = max(c_x, 0), max(c_y, 0)
+            window = haystack[c_y:c_y + c_h, c_x:c_x + c_w]
+            if window.shape[0] < scaled.shape[0] or window.shape[1] < scaled.shape[1]:
+                continue
+            _, score, _, (m_x, m_y) = cv.minMaxLoc(cv.matchTemplate(window, scaled, cv.TM_CCOEFF_NORMED))
+            if score >= confidence and (best is None or score > best.score):
+                n_h, n_w = scaled.shape[:2]
+                best = Hit(x + c_x + m_x + n_w / 2, y + c_y + m_y + n_h / 2,
+                           needle if isinstance(needle, str) else None, score, n_w, n_h)
+                best_scale = scale
+        trace('_Locatescaledonscreen', best, best_scale)
+        _observe('locate_scaled', needle=needle if isinstance(needle, str) else None, region=region,
+                 result=best, scale=best_scale)
+        return best, best_scale
+
+
 class Pixelmatchescolor:
-    def __call__(self, *args, **kwargs):
-        logging.info('Pixelmatchescolor: {}, {}'.format(args, kwargs))
-        return pyautogui.pixelMatchesColor(*args, **kwargs)
+    def __call__(self, x, y, *args, **kwargs):
+        trace('Pixelmatchescolor', x, y, args, kwargs)
+        view, _ = frame_cache.region((x, y, 1, 1))
+        return _pixel_matches_color(view, 0, 0, *args, **kwargs)
+
+
+class Locatecolorchange:
+    """For every start point (dict key: Point) finds first of count pixels, going by step px along x,
+    which does not match color. All points are checked at once in one frame.
+    Returns dict key: Point (or None if all pixels match color)"""
+    def __call__(self, points, color, tolerance=0, step=-24, count=3):
+        trace('Locatecolorchange', points, color, tolerance)
+        keys = list(points)
+        if not keys:
+            return dict()
+        width, height = frame_cache.size()
+        offsets = np.arange(count) * step
+        xs = np.clip(np.array([points[key].x for key in keys])[:, None] + offsets, 0, width - 1)
+        ys = np.clip(np.array([points[key].y for key in keys])[:, None].repeat(count, axis=1), 0, height - 1)
+        # only the bounding box of checked pixels is needed
+        view, (x, y, _, _) = frame_cache.region((xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1))
+        bgr = np.array(color[:3][::-1], dtype=int)
+        changed = (np.abs(view[ys - y, xs - x].astype(int) - bgr) > tolerance).any(axis=2)
+        first = changed.argmax(axis=1)
+        result = dict((key, Point(xs[i, first[i]], ys[i, first[i]]) if changed[i, first[i]] else None)
+                      for i, key in enumerate(keys))
+        trace('_Locatecolorchange', result)
+        return result
 
 
 class Moveto:
     def __call__(self, *args, **kwargs):
-        logging.info('Moveto: {}, {}'.format(args, kwargs))
-        return pyautogui.moveTo(*args, **kwargs)
+        trace('Moveto', args, kwargs)
+        with pacer('move', _position(args)):
+            result = input_backend.moveTo(*args, **kwargs)
+        return result
 
 
 class Hotkey:
     def __call__(self, *args, **kwargs):
-        logging.info('Hotkey: {}, {}'.format(args, kwargs))
-        return pyautogui.hotkey(*args, **kwargs)
+        trace('Hotkey', args, kwargs)
+        with pacer('hotkey'):
+            result = input_backend.hotkey(*args, **kwargs)
+        return result
 
 
 class Alert:
     def __call__(self, *args, **kwargs):
-        logging.info('Alert: {}, {}'.format(args, kwargs))
-        return pyautogui.alert(*args, **kwargs)
+        trace('Alert', args, kwargs)
+        result = pyautogui.alert(*args, **kwargs)
+        frame_cache.invalidate()
+        return result
 
 
 class Prompt:
     def __call__(self, *args, **kwargs):
-        logging.info('Alert: {}, {}'.format(args, kwargs))
-        return pyautogui.prompt(*args, **kwargs)
+        trace('Prompt', args, kwargs)
+        result = pyautogui.prompt(*args, **kwargs)
+        frame_cache.invalidate()
+        return result
 
 
 class Press:
     def __call__(self, *args, **kwargs):
-        logging.info('Press: {}, {}'.format(args, kwargs))
-        return pyautogui.press(*args, **kwargs)
+        trace('Press', args, kwargs)
+        with pacer('press'):
+            result = input_backend.press(*args, **kwargs)
+        return result
 
 
 class Scroll:
     def __call__(self, *args, **kwargs):
-        logging.info('Scroll: {}, {}'.format(args, kwargs))
-        return pyautogui.scroll(*args, **kwargs)
+        trace('Scroll', args, kwargs)
+        with pacer('scroll'):
+            result = input_backend.scroll(*args, **kwargs)
+        return result
 
 
 class Confirm:
     def __call__(self, *args, **kwargs):
-        logging.info('Confirm: {}, {}'.format(args, kwargs))
-        return pyautogui.confirm(*args, **kwargs)
+        trace('Confirm', args, kwargs)
+        result = pyautogui.confirm(*args, **kwargs)
+        frame_cache.invalidate()
+        return result
 
 
 class Dragto:
     def __call__(self, *args, **kwargs):
-        logging.info('Dragto: {}, {}'.format(args, kwargs))
+        trace('Dragto', args, kwargs)
         if len(args) == 1 and len(args[0]) == 2:
             args = args[0] + (1/6,)
-        return pyautogui.dragTo(*args, **kwargs)
+        with pacer('drag', _position(args)):
+            result = input_backend.dragTo(*args, **kwargs)
+        return result
+
+
+class Inputbatch:
+    """Executes list of input operations in one loop, with one log line. Operation is tuple
+    (action, args) or (action, args, delay), action: click, move, write, press, hotkey, scroll or drag,
+    args: position for click/move/drag, text/key(s) for write/press/hotkey, clicks for scroll.
+    delay - minimum seconds since the previous input (never less than pacer gap of the action).
+    react of the action (pacer) is waited for after clicks, moves and drags, as in single wrappers.
+    background=True runs the batch on the input thread and returns its Future."""
+    ACTIONS = {'click': 'click', 'move': 'moveTo', 'write': 'write', 'press': 'press', 'hotkey': 'hotkey',
+               'scroll': 'scroll', 'drag': 'dragTo'}
+
+    def __init__(self):
+        self._thread = None
+
+    def __call__(self, operations, background=False):
+        operations = [tuple(operation) for operation in operations]
+        unknown = [operation[0] for operation in operations if operation[0] not in self.ACTIONS]
+        if unknown:
+            raise KeyError('Unknown input actions {}'.format(unknown))
+        trace('Inputbatch', len(operations), background)
+        if background:
+            if self._thread is None:
+                self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='input')
+            return self._thread.submit(self._run, operations)
+        return self._run(operations)
+
+    def _run(self, operations):
+        for operation in operations:
+            action, args = operation[:2]
+            delay = operation[2] if len(operation) > 2 else 0
+            pacer.wait_gap(action, max(delay, pacer.actions[action]['gap']))
+            position = None
+            if action in ('click', 'move', 'drag'):
+                args = position = (args.x, args.y) if hasattr(args, 'x') else tuple(args)
+            else:
+                args = tuple(args) if action == 'hotkey' else (args,)
+            watched = pacer.before(action, position)
+            if action == 'click':
+                input_backend.moveTo(*args)
+                clock.sleep(pacer.hover)
+            if action == 'drag':
+                args += (1/6,)
+            getattr(input_backend, self.ACTIONS[action])(*args)
+            pacer.after(action, watched)
+        trace('_Inputbatch')
 
 
 class ScreenShot:
+    """pyautogui.screenshot taken through frame_cache, returns PIL image (only region is grabbed, if given)"""
+    def __call__(self, region=None):
+        trace('ScreenShot', region)
+        view, _ = frame_cache.region(region)
+        return Image.fromarray(cv.cvtColor(view, cv.COLOR_BGR2RGB))
+
+
+class Grabregions:
+    """returns list of many regions (BGR numpy arrays), cut from one capture of their bounding box"""
+    def __call__(self, regions):
+        trace('Grabregions', regions)
+        regions = [[int(i) for i in region] for region in regions]
+        if not regions:
+            return []
+        x0, y0 = min(r[0] for r in regions), min(r[1] for r in regions)
+        x1, y1 = max(r[0] + r[2] for r in regions), max(r[1] + r[3] for r in regions)
+        view, (x, y, _, _) = frame_cache.region((x0, y0, x1 - x0, y1 - y0))
+        return [view[r_y - y:r_y - y + h, r_x - x:r_x - x + w].copy() for r_x, r_y, w, h in regions]
+
+
+class Waituntil:
+    """Polls condition until it returns truthy value (returned), or timeout (None = forever) passes (returns None).
+    Polling starts every interval seconds and slows down 1.5 times per poll up to max_interval. Every poll
+    works on fresh frame, shared by all locates inside condition. on_retry (e.g. re-click) is called every
+    retry_every seconds. Time to ready is recorded per name."""
+    def __init__(self):
+        self.records = dict()
+
+    def __call__(self, condition, timeout=60, interval=.1, max_interval=1., on_retry=None, retry_every=None,
+                 name=None):
+        name = name or getattr(condition, '__name__', 'condition')
+        trace('Waituntil', name, timeout)
+        record = self.records.setdefault(name, {'count': 0, 'timeouts': 0, 'polls': 0, 'total': 0., 'max': 0.})
+        record['count'] += 1
+        t0 = clock.time()
+        retried = t0
+        while True:
+            frame_cache.invalidate()
+            result = condition()
+            record['polls'] += 1
+            now = clock.time()
+            if result:
+                record['total'] += now - t0
+                record['max'] = max(record['max'], now - t0)
+                trace('_Waituntil', name, round(now - t0, 2))
+                return result
+            if timeout is not None and now - t0 >= timeout:
+                record['timeouts'] += 1
+                logging.warning('_Waituntil: {} not ready in {} s'.format(name, timeout))
+                return None
+            if on_retry and retry_every is not None and now - retried >= retry_every:
+                on_retry()
+                retried = clock.time()
+            clock.sleep(interval if timeout is None else min(interval, max(t0 + timeout - now, 0)))
+            interval = min(interval * 1.5, max_interval)
+
+    def stats(self):
+        return dict((name, dict(record, mean=record['total'] / max(record['count'] - record['timeouts'], 1)))
+                    for name, record in self.records.items())
+
+
+class Waituntilvisible:
+    """waits until needle is located on screen, returns its location or None. Arguments as in wait_until
+    and locateOnScreen"""
+    def __call__(self, needle, timeout=60, on_retry=None, retry_every=None, name=None, **kwargs):
+        name = name or (needle if isinstance(needle, str) else None)
+        return wait_until(lambda: locateOnScreen(needle, **kwargs), timeout, on_retry=on_retry,
+                          retry_every=retry_every, name=name)
+
+
+class Waituntilgone:
+    """waits until needle disappears from screen, returns True or None on timeout"""
+    def __call__(self, needle, timeout=60, on_retry=None, retry_every=None, name=None, **kwargs):
+        name = name or ('gone ' + needle if isinstance(needle, str) else None)
+        return wait_until(lambda: locateOnScreen(needle, **kwargs) is None, timeout, on_retry=on_retry,
+                          retry_every=retry_every, name=name)
+
+
+class _Timed:
+    """Wraps my_pygui callable, recording latency of every call (latency.latency), by template name
+    and region size"""
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+
+    def _key(self, args, kwargs):
+        if not self.name.startswith(('locate', 'wait_until')):
+            needle = None
+        else:
+            needle = args[0] if args else kwargs.get('needle', kwargs.get('needles'))
+        if self.name.startswith('wait_until') and not isinstance(needle, str):
+            needle = kwargs.get('name', getattr(needle, '__name__', None))
+        if isinstance(needle, (dict, list, tuple)) and all(isinstance(i, str) for i in needle):
+            needle = '{} templates'.format(len(needle))
+        elif not isinstance(needle, str):
+            needle = '-'
+        region = kwargs.get('region')
+        if region is None and self.name == 'screenshot' and args:
+            region = args[0]
+        if self.name == 'pixelMatchesColor':
+            size = '1x1'
+        elif region is not None:
+            size = '{}x{}'.format(int(region[2]), int(region[3]))
+        else:
+            size = 'full' if self.name.startswith(('locate', 'screenshot', 'wait_until_')) else '-'
+        return '{} {}'.format(needle, size)
+
     def __call__(self, *args, **kwargs):
-        logging.info('ScreenShot: {}, {}'.format(args, kwargs))
-        return pyautogui.screenshot(*args, **kwargs)
-
-
-click = Click()
-write = Write()
-center = Center()
-locateAllOnScreen = Locateallonscreen()
-locateAll = Locateall()
-locateOnScreen = Locateonscreen()
-locate = Locate()
-pixelMatchesColor = Pixelmatchescolor()
-moveTo = Moveto()
-hotkey = Hotkey()
-alert = Alert()
-prompt = Prompt()
-press = Press()
-scroll = Scroll()
-confirm = Confirm()
-dragTo = Dragto()
-screenshot = ScreenShot()
+        t0 = time.perf_counter()
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            latency.record(self.name, self._key(args, kwargs), time.perf_counter() - t0)
+
+    def __getattr__(self, name):
+        return getattr(self.function, name)
+
+
+click = _Timed('click', Click())
+write = _Timed('write', Write())
+center = _Timed('center', Center())
+locateAllOnScreen = _Timed('locateAllOnScreen', Locateallonscreen())
+locateAll = _Timed('locateAll', Locateall())
+locateOnScreen = _Timed('locateOnScreen', Locateonscreen())
+locateTemplatesOnScreen = _Timed('locateTemplatesOnScreen', Locatetemplatesonscreen())
+locateScaledOnScreen = _Timed('locateScaledOnScreen', Locatescaledonscreen())
+locate = _Timed('locate', Locate())
+pixelMatchesColor = _Timed('pixelMatchesColor', Pixelmatchescolor())
+locateColorChange = _Timed('locateColorChange', Locatecolorchange())
+moveTo = _Timed('moveTo', Moveto())
+hotkey = _Timed('hotkey', Hotkey())
+alert = _Timed('alert', Alert())
+prompt = _Timed('prompt', Prompt())
+press = _Timed('press', Press())
+scroll = _Timed('scroll', Scroll())
+confirm = _Timed('confirm', Confirm())
+dragTo = _Timed('dragTo', Dragto())
+screenshot = _Timed('screenshot', ScreenShot())
+grab_regions = _Timed('grab_regions', Grabregions())
+input_batch = _Timed('input_batch', Inputbatch())
+wait_until = _Timed('wait_until', Waituntil())
+wait_until_visible = _Timed('wait_until_visible', Waituntilvisible())
+wait_until_gone = _Timed('wait_until_gone', Waituntilgone())
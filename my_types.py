@@ -1,6 +1,6 @@
 from enum import Enum
 import pickle
-import logging
+from tracer import trace
 import copy
 import json
 import wx
@@ -44,12 +44,12 @@ class Point:
 
     @classmethod
     def from_point(cls, point):
-        logging.info('Point:from_point:')
+        trace.debug('Point:from_point')
         return cls(point.x, point.y)
 
     @classmethod
     def from_list(cls, list_):
-        logging.info('Point:from_list:')
+        trace.debug('Point:from_list')
         return cls(list_[0], list_[1])
 
     @classmethod
@@ -58,7 +58,7 @@ class Point:
         return cls(list_[0] + list_[2] / 2, list_[1] + list_[3] / 2)
 
     def __str__(self):
-        logging.info('Point:__str__:')
+        trace.debug('Point:__str__')
         return "({0},{1})".format(self.x, self.y)
 
     def __sub__(self, other):
@@ -80,14 +80,14 @@ class Point:
         return self.x == other.x and self.y == other.y
 
     def __truediv__(self, other):
-        logging.info('Point:__truediv__:')
+        trace.debug('Point:__truediv__')
         # works only if self is point, and other is int
         x = self.x // other
         y = self.y // other
         return Point(x, y)
 
     def get(self):
-        logging.info('Point:get:')
+        trace.debug('Point:get')
         return self.x, self.y
 
     def __repr__(self):
@@ -95,9 +95,22 @@ class Point:
         return 'Point(x={}, y={})'.format(self.x, self.y)
 
 
+class Hit(Point):
+    """center of located template, with its label, size and match score"""
+    def __init__(self, x=0, y=0, label=None, score=0., w=0, h=0):
+        super().__init__(x, y)
+        self.label = label
+        self.score = float(score)
+        self.w = int(w)
+        self.h = int(h)
+
+    def __repr__(self):
+        return 'Hit(x={}, y={}, label={}, score={:.3f})'.format(self.x, self.y, self.label, self.score)
+
+
 class Box:
     def __init__(self, x=0, y=0, w=0, h=0):
-        logging.info('Box:__init__:')
+        trace.debug('Box:__init__')
         self.x = int(x)
         self.y = int(y)
         self.w = int(w)
@@ -105,11 +118,11 @@ class Box:
 
     @classmethod
     def from_box(cls, box):
-        logging.info('Box:from_box:')
-        return cls(box.left, box.top, box.width, box.height)
+        trace.debug('Box:from_box')
+        return cls(*box[:4])
 
     def __repr__(self):
-        logging.info('Box:__repr__:')
+        trace.debug('Box:__repr__')
         return 'Box(x={}, y={}, w={}, h={})'.format(self.x, self.y, self.w, self.h)
 
 
@@ -146,71 +159,71 @@ with open('data/conf.dat', 'rb') as config_dictionary_file:
 
 class Adventure:
     def __init__(self, name, description=''):
-        logging.info('Adventure:__init__:')
+        trace.debug('Adventure:__init__')
         self.name = name
         self.description = description
         self.generals = list()
         self.actions = list()
 
     def add_general(self, index, **kwargs):
-        logging.info('Adventure:add_general:')
+        trace.debug('Adventure:add_general')
         """inserting general at index, or at the end when index==None"""
         self.generals.insert(index, General(**kwargs))
         self.fix_ids()
 
     def add_action(self, index, **kwargs):
-        logging.info('Adventure:add_action:')
+        trace.debug('Adventure:add_action')
         """inserting general at index, or at the end when index==None"""
         self.actions.insert(index, Action(**kwargs))
         # self.fix_ids()
 
     def remove_general(self, index):
-        logging.info('Adventure:remove_general:')
+        trace.debug('Adventure:remove_general')
         popped = self.generals.pop(index)
         self.fix_ids()
         return popped
 
     def remove_action(self, index):
-        logging.info('Adventure:remove_action:')
+        trace.debug('Adventure:remove_action')
         popped = self.actions.pop(index)
         # self.fix_ids()
         return popped
 
     def move_general(self, from_, to):
-        logging.info('Adventure:move_general:')
+        trace.debug('Adventure:move_general')
         moving = self.remove_general(from_)
         self.generals.insert(to, moving)
         # self.fix_ids()
 
     def move_action(self, from_, to):
-        logging.info('Adventure:move_action:')
+        trace.debug('Adventure:move_action')
         moving = self.remove_action(from_)
         self.actions.insert(to, moving)
         # self.fix_ids()
 
     def set_actions_active(self, rows, value):
-        logging.info('Action:set_active:')
+        trace.debug('Action:set_active')
         for row in rows:
             self.actions[row].set_active(value)
 
     def fix_ids(self):
-        logging.info('Adventure:fix_ids:')
+        trace.debug('Adventure:fix_ids')
         for index, gen in enumerate(self.generals):
             gen.id = index
 
     def get_generals_names(self):
-        logging.info('Adventure:get_generals_names:')
+        trace.debug('Adventure:get_generals_names')
         return [gen.name for gen in self.generals]
 
     def save(self, path):
-        logging.info('Adventure:save:')
+        trace.debug('Adventure:save')
         path += '.adv' if path[-4:] != '.adv' else ''
         with open(path, 'wb') as f:
             pickle.dump(self, f)
 
     @classmethod
     def open(cls, path):
-        logging.info('Adventure:open:')
+        trace.debug('Adventure:open')
         with open(path, 'rb') as f:
             return pickle.load(f)
 
@@ -231,7 +244,7 @@ class Adventure:
 
 class Action:
     def __init__(self, *args, **kwargs):
-        logging.info('Action:__init__:')
+        trace.debug('Action:__init__')
         self.no = kwargs.get('no', 0)
         self.type = kwargs.get('type', '')
         self.delay = kwargs.get('delay', 0)
@@ -246,23 +259,23 @@ class Action:
             return getattr(self, attr, False)
 
     def set_data_from_table(self, attr, value):
-        logging.info('Action:set_data_from_table:')
+        trace.debug('Action:set_data_from_table')
         setattr(self, attr, value)
 
     def set_active(self, value):
-        logging.info('Action:set_active:')
+        trace.debug('Action:set_active')
         self.active = value
 
     def get_generals(self):
-        logging.info('Action:get_generals:')
+        trace.debug('Action:get_generals')
         return self.generals
 
     def add_general(self, general):
-        logging.info('Action:add_general:')
+        trace.debug('Action:add_general')
         self.generals.append(copy.deepcopy(general))
 
     def del_general(self, general):
-        logging.info('Action:del_general:')
+        trace.debug('Action:del_general')
         self.generals.remove(general)
 
     def as_json(self):
@@ -274,7 +287,7 @@ class Action:
 
 class General:
     def __init__(self, *args, **kwargs):
-        logging.info('General:__init__:')
+        trace.debug('General:__init__')
         self.keys = ["recruit", "bowmen", "militia",
                      "cavalry", "longbowman", "soldier",
                      "crossbowman", "elite_soldier", "cannoneer"]
@@ -301,23 +314,23 @@ class General:
         self.id_ref = None
 
     def get_units(self, key_or_index):
-        logging.info('General:get_units:')
+        trace.debug('General:get_units')
         key = self._key_to_index(key_or_index)
         return self.army[key]
 
     def set_units(self, key_or_index, value):
-        logging.info('General:set_units:')
+        trace.debug('General:set_units')
         key = self._key_to_index(key_or_index)
         self.army[key] = value
 
     def _key_to_index(self, key_or_index):
-        logging.info('General:_key_to_index:')
+        trace.debug('General:_key_to_index')
         assert isinstance(key_or_index, int) or isinstance(key_or_index, str)
         key = key_or_index if isinstance(key_or_index, str) else self.keys[key_or_index]
         return key
 
     def as_json(self):
-        logging.info('General:as_json:')
+        trace.debug('General:as_json')
         # print(self.__dict__)
         json = {}
         army = {}
@@ -1,10 +1,18 @@
 import pytesseract
 import cv2 as cv
+import ctypes
+import ctypes.util
+import hashlib
+import json
 import logging
+import multiprocessing
 import numpy as np
 import time
 import gettext
 import os
+import shlex
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 localedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'locale')
 lang_en = gettext.translation('settlersbot', localedir, fallback=True, languages=['en'])
@@ -12,16 +20,492 @@ lang_pl = gettext.translation('settlersbot', localedir, fallback=True, languages
 _ = lang_pl.gettext
 
 
+_adjusted = OrderedDict()
+observers = []
+
+
+def _observe(function, img, result):
+    """passes capture (RGB numpy array) given to public reading function and its result to observers"""
+    for observer in observers:
+        observer(function, np.asarray(img), result)
+
+
+def _observed(function):
+    def observed(img):
+        result = function(img)
+        if observers:
+            _observe(function.__name__, img, result)
+        return result
+    observed.__name__ = function.__name__
+    observed.__doc__ = function.__doc__
+    return observed
+
+
 def image_adjusting(img):
-    img = cv.cvtColor(np.array(img), cv.COLOR_RGB2BGR)
+    """return 4x upscaled, inverted binary BGR image of RGB capture (PIL image or numpy array).
+    Results for the last captures are kept, so functions reading the same capture adjust it once"""
+    img = np.asarray(img)
+    key = hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=16).digest() + str(img.shape).encode()
+    if key in _adjusted:
+        _adjusted.move_to_end(key)
+        return _adjusted[key]
+    img = cv.cvtColor(img, cv.COLOR_RGB2BGR)
     resized = cv.resize(img, (img.shape[1] * 4, img.shape[0] * 4), interpolation=cv.INTER_LINEAR)
     _, img_ = cv.threshold(resized, 127, 255, cv.THRESH_BINARY_INV)
+    _adjusted[key] = img_
+    while len(_adjusted) > 32:
+        _adjusted.popitem(last=False)
     return img_
 
 
-def data_from_image(img):
-    custom_config = r'-c tessedit_char_whitelist="1234567890/ " --psm 6'
-    d = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=custom_config)
+def _parse_config(config):
+    """return (lang, psm, variables) of pytesseract config string"""
+    words = shlex.split(config)
+    lang, psm, variables = 'eng', None, dict()
+    for i, word in enumerate(words):
+        if word == '-l' and i + 1 < len(words):
+            lang = words[i + 1]
+        elif word == '--psm' and i + 1 < len(words):
+            psm = int(words[i + 1])
+        elif word == '-c' and i + 1 < len(words):
+            key, _, value = words[i + 1].partition('=')
+            variables[key] = value
+        elif word == 'digits':
+            variables.setdefault('tessedit_char_whitelist', '0123456789')
+    return lang, psm, variables
+
+
+class TessEngine:
+    """tesseract C API (libtesseract through ctypes) - language data is loaded once per language and kept"""
+    def __init__(self, library=None):
+        path = library or ctypes.util.find_library('tesseract')
+        if not path:
+            raise OSError('libtesseract not found')
+        self.lib = ctypes.CDLL(path)
+        self.lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        self.lib.TessBaseAPIInit3.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        self.lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.lib.TessBaseAPISetVariable.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        self.lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                                 ctypes.c_int, ctypes.c_int]
+        self.lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        self.lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        self.lib.TessBaseAPIGetTsvText.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.lib.TessBaseAPIGetTsvText.restype = ctypes.c_void_p
+        self.lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        self.lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        self.lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        self.lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+        self._apis = dict()
+
+    def _api(self, lang):
+        if lang not in self._apis:
+            api = self.lib.TessBaseAPICreate()
+            if self.lib.TessBaseAPIInit3(api, None, lang.encode()):
+                self.lib.TessBaseAPIDelete(api)
+                raise OSError('tesseract language {} not loaded'.format(lang))
+            self._apis[lang] = api
+        return self._apis[lang]
+
+    def recognise(self, img, config, tsv=False):
+        """return text (or tsv rows, as tesseract's image_to_data) of gray uint8 img"""
+        lang, psm, variables = _parse_config(config)
+        api = self._api(lang)
+        self.lib.TessBaseAPISetPageSegMode(api, 3 if psm is None else psm)
+        variables.setdefault('tessedit_char_whitelist', '')
+        for key, value in variables.items():
+            self.lib.TessBaseAPISetVariable(api, key.encode(), value.encode())
+        img = np.ascontiguousarray(img)
+        self.lib.TessBaseAPISetImage(api, img.ctypes.data, img.shape[1], img.shape[0], 1, img.strides[0])
+        pointer = self.lib.TessBaseAPIGetTsvText(api, 0) if tsv else self.lib.TessBaseAPIGetUTF8Text(api)
+        try:
+            return ctypes.string_at(pointer).decode() if pointer else ''
+        finally:
+            if pointer:
+                self.lib.TessDeleteText(pointer)
+            self.lib.TessBaseAPIClear(api)
+
+    def close(self):
+        for api in self._apis.values():
+            self.lib.TessBaseAPIEnd(api)
+            self.lib.TessBaseAPIDelete(api)
+        self._apis = dict()
+
+
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    _engine = TessEngine()
+
+
+def _recognise(img, config, tsv):
+    return _engine.recognise(img, config, tsv)
+
+
+_TSV_COLUMNS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+def _tsv_to_dict(tsv):
+    d = dict((column, []) for column in _TSV_COLUMNS)
+    for line in tsv.splitlines():
+        values = line.split('\t')
+        if len(values) < len(_TSV_COLUMNS) - 1:
+            continue
+        values += [''] * (len(_TSV_COLUMNS) - len(values))
+        for column, value in zip(_TSV_COLUMNS, values):
+            if column == 'text':
+                d[column].append(value)
+            elif column == 'conf':
+                d[column].append(float(value))
+            else:
+                d[column].append(int(value))
+    return d
+
+
+class OcrPool:
+    """Pool of long-lived OCR worker processes (spawned, not forked), each holding loaded tesseract engine
+    (TessEngine). Crops are sent as gray arrays. If libtesseract is not available, or a worker fails, dies or
+    does not answer in timeout seconds, the pool is shut down and pytesseract is used from then on."""
+    def __init__(self, processes=2, timeout=10.):
+        self.processes = processes
+        self.timeout = timeout
+        self.available = None
+        self._pool = None
+
+    def _ready(self):
+        if self.available is None:
+            try:
+                TessEngine()
+                self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker)
+                self.available = True
+            except OSError as e:
+                logging.info('OCR worker pool not available ({}) - using pytesseract'.format(e))
+                self.available = False
+        return self.available
+
+    def _fail(self, e):
+        logging.warning('OCR worker failed ({!r}) - using pytesseract from now on'.format(e))
+        self.available = False
+        self._shutdown()
+
+    def _shutdown(self):
+        if self._pool is not None:
+            # hung workers would never finish - they are terminated
+            for process in list((getattr(self._pool, '_processes', None) or dict()).values()):
+                process.terminate()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def _gray(img):
+        img = np.asarray(img)
+        return cv.cvtColor(img, cv.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
+
+    def _recognise(self, imgs, config, tsv):
+        """return results of imgs recognised by the workers, or None if the pool is not (any more) available"""
+        if not self._ready():
+            return None
+        try:
+            futures = [self._pool.submit(_recognise, self._gray(img), config, tsv) for img in imgs]
+            return [future.result(timeout=self.timeout) for future in futures]
+        except Exception as e:
+            self._fail(e)
+            return None
+
+    def image_to_string(self, img, config=''):
+        texts = self._recognise([img], config, False)
+        if texts is not None:
+            return texts[0]
+        return pytesseract.image_to_string(img, config=config)
+
+    def image_to_data(self, img, config=''):
+        tsv = self._recognise([img], config, True)
+        if tsv is not None:
+            return _tsv_to_dict(tsv[0])
+        return pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=config)
+
+    def map_to_string(self, imgs, config=''):
+        """return texts of many imgs, recognised in parallel by the workers"""
+        texts = self._recognise(imgs, config, False)
+        if texts is not None:
+            return texts
+        return [pytesseract.image_to_string(img, config=config) for img in imgs]
+
+    def close(self):
+        self._shutdown()
+        self.available = None
+
+
+workers = OcrPool()
+
+
+class Glyphs:
+    """In-process recogniser of the game font. Thresholded image (dark text on white, see image_adjusting)
+    is segmented into glyphs (columns with ink), every glyph is padded to aspect ratio of size, scaled to it
+    and compared (normalised correlation) with templates of known chars. Templates are learned from texts read
+    by tesseract (when number of glyphs agrees with the text) - glyph becomes template only when the same
+    char was read for it agree times (and never other char), or at once when the reading is confirmed
+    (confirm). Templates are kept in directory as <char code>_<no>.png.
+    recognise returns None, if there are no templates or any glyph scores below threshold."""
+    def __init__(self, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'save', 'glyphs'),
+                 size=(12, 20), threshold=.85, per_char=8, agree=3):
+        self.directory = directory
+        self.size = size
+        self.threshold = threshold
+        self.per_char = per_char
+        self.agree = agree
+        self.templates = dict()
+        self._chars = []
+        self._matrix = None
+        self._candidates = []
+        self._recent = deque(maxlen=16)
+        self.load()
+
+    def load(self):
+        self.templates = dict()
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                code, _, _ = name.partition('_')
+                image = cv.imread(os.path.join(self.directory, name), cv.IMREAD_GRAYSCALE)
+                if code.isdigit() and image is not None:
+                    self.templates.setdefault(chr(int(code)), []).append(self._vector(image < 128))
+        self._build()
+
+    def _build(self):
+        self._chars = [char for char, vectors in self.templates.items() for _ in vectors]
+        vectors = [vector for char in self.templates for vector in self.templates[char]]
+        self._matrix = np.array(vectors) if vectors else None
+
+    def _vector(self, mask):
+        """return mean centred, unit length vector of glyph mask padded (centred) to aspect ratio of size and
+        scaled to it - narrow glyphs (1, /) keep their shape instead of being stretched to full ink"""
+        h, w = mask.shape
+        width, height = self.size
+        if w * height < h * width:
+            pad = int(round(h * width / height)) - w
+            mask = np.pad(mask, ((0, 0), (pad // 2, pad - pad // 2)))
+        else:
+            pad = int(round(w * height / width)) - h
+            mask = np.pad(mask, ((pad // 2, pad - pad // 2), (0, 0)))
+        glyph = cv.resize(mask.astype(np.float32), self.size, interpolation=cv.INTER_AREA).ravel()
+        glyph -= glyph.mean()
+        norm = np.linalg.norm(glyph)
+        return glyph / norm if norm else glyph
+
+    @staticmethod
+    def ink(img):
+        gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
+        return gray < 128
+
+    def segment(self, img):
+        """return list of glyph boxes (x, y, w, h) and list of gaps before them (px)"""
+        mask = self.ink(img)
+        columns = np.concatenate(([False], mask.any(axis=0), [False]))
+        edges = np.flatnonzero(np.diff(columns.astype(np.int8)))
+        boxes, gaps, last = [], [], None
+        for start, end in zip(edges[::2], edges[1::2]):
+            rows = np.flatnonzero(mask[:, start:end].any(axis=1))
+            boxes.append((int(start), int(rows[0]), int(end - start), int(rows[-1] - rows[0] + 1)))
+            gaps.append(int(start - last) if last is not None else 0)
+            last = end
+        return boxes, gaps
+
+    def recognise(self, img):
+        """return (words, confidence), words - list of (text, (x, y, w, h)), or None if not sure"""
+        if self._matrix is None:
+            return None
+        mask = self.ink(img)
+        boxes, gaps = self.segment(img)
+        if not boxes:
+            return None
+        vectors = np.array([self._vector(mask[y:y + h, x:x + w]) for x, y, w, h in boxes])
+        scores = vectors @ self._matrix.T
+        best = scores.argmax(axis=1)
+        confidence = float(scores[np.arange(len(boxes)), best].min())
+        if confidence < self.threshold:
+            return None
+        space = max(h for _, _, _, h in boxes) * .6
+        words = []
+        for (x, y, w, h), gap, index in zip(boxes, gaps, best):
+            if not words or gap > space:
+                words.append(['', [x, y, x + w, y + h]])
+            words[-1][0] += self._chars[index]
+            box = words[-1][1]
+            box[1], box[2], box[3] = min(box[1], y), x + w, max(box[3], y + h)
+        return [(text, (x0, y0, x1 - x0, y1 - y0)) for text, (x0, y0, x1, y1) in words], confidence
+
+    def _glyphs(self, img, text):
+        """return list of (char, tight mask) of img read as text, or None if numbers of glyphs and chars differ"""
+        chars = ''.join(text.split())
+        boxes, _ = self.segment(img)
+        if not chars or len(chars) != len(boxes):
+            return None
+        mask = self.ink(img)
+        return [(char, mask[y:y + h, x:x + w]) for char, (x, y, w, h) in zip(chars, boxes)]
+
+    def learn(self, img, text, confirmed=False):
+        """counts reading of img as text (by tesseract) - glyphs read as the same char agree times (confirmed
+        at once) become templates, return True if any template was added"""
+        glyphs = self._glyphs(img, text)
+        if glyphs is None:
+            return False
+        if not confirmed:
+            self._recent.append((img.copy(), text))
+        learned = False
+        for char, mask in glyphs:
+            vector = self._vector(mask)
+            if self._matrix is not None and (self._matrix @ vector).max() > .95:
+                # already known (or conflicting with other char) - nothing to learn
+                continue
+            if len(self.templates.get(char, ())) >= self.per_char:
+                continue
+            if not confirmed:
+                similar = [candidate for candidate in self._candidates if candidate[1] @ vector > .95]
+                if any(candidate[0] != char for candidate in similar):
+                    # the same glyph was read as other char - readings are not trusted
+                    self._candidates = [candidate for candidate in self._candidates
+                                       if not any(candidate is other for other in similar)]
+                    continue
+                if not similar:
+                    self._candidates.append([char, vector, 1])
+                    continue
+                similar[0][2] += 1
+                if similar[0][2] < self.agree:
+                    continue
+                self._candidates.remove(similar[0])
+            self.templates.setdefault(char, []).append(vector)
+            os.makedirs(self.directory, exist_ok=True)
+            cv.imwrite(os.path.join(self.directory, '{}_{}.png'.format(ord(char), len(self.templates[char]) - 1)),
+                       np.where(mask, 0, 255).astype(np.uint8))
+            learned = True
+            self._build()
+        return learned
+
+    def confirm(self, value):
+        """learns recent readings containing word value at once - their text was confirmed by the caller
+        (e.g. sum of units, which set_army expected)"""
+        learned = False
+        for img, text in list(self._recent):
+            if value in text.split():
+                learned = self.learn(img, text, confirmed=True) or learned
+        return learned
+
+
+glyphs = Glyphs()
+
+
+class OcrCache:
+    """Bounded LRU of OCR results, keyed by hash of the (thresholded) image and OCR config. With path
+    (open) results are appended to JSON-lines file and loaded from it on the next start. The file is rewritten
+    with the cached results only, when opened and when it grows to twice the size lines."""
+    def __init__(self, size=1024):
+        self.size = size
+        self.path = None
+        self.hits = 0
+        self.misses = 0
+        self._lines = 0
+        self._results = OrderedDict()
+
+    @staticmethod
+    def key(img, config):
+        img = np.ascontiguousarray(img)
+        digest = hashlib.blake2b(img.data, digest_size=16)
+        digest.update('{} {}'.format(img.shape, config).encode())
+        return digest.hexdigest()
+
+    def open(self, path):
+        self.path = path
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        key, result = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._store(key, result)
+        self._compact()
+
+    def _compact(self):
+        with open(self.path + '.tmp', 'w') as f:
+            for key, result in self._results.items():
+                f.write(json.dumps([key, result]) + '\n')
+        os.replace(self.path + '.tmp', self.path)
+        self._lines = len(self._results)
+
+    def _store(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def get(self, key):
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._store(key, result)
+        if self.path:
+            if self._lines >= 2 * self.size:
+                self._compact()
+                return
+            with open(self.path, 'a') as f:
+                f.write(json.dumps([key, result]) + '\n')
+            self._lines += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / total if total else 0.,
+                'size': len(self._results)}
+
+
+cache = OcrCache()
+
+
+def read_text(img, config):
+    """return text of (adjusted) img - by glyphs if sure, otherwise by tesseract (learning the glyphs)"""
+    key = cache.key(img, 'text ' + config)
+    text = cache.get(key)
+    if text is not None:
+        return text
+    recognised = glyphs.recognise(img)
+    if recognised:
+        text = ' '.join(text for text, _ in recognised[0])
+    else:
+        text = workers.image_to_string(img, config)
+        glyphs.learn(img, text)
+    cache.put(key, text)
+    return text
+
+
+def data_from_image(img, custom_config=r'-c tessedit_char_whitelist="1234567890/ " --psm 6'):
+    key = cache.key(img, 'data ' + custom_config)
+    have = cache.get(key)
+    if have is not None:
+        return have
+    have = _data_from_image(img, custom_config)
+    cache.put(key, have)
+    return have
+
+
+def _data_from_image(img, custom_config):
+    recognised = glyphs.recognise(img)
+    if recognised:
+        words = recognised[0]
+        return {'text': [text for text, _ in words],
+                'left': [box[0] for _, box in words],
+                'top': [box[1] for _, box in words],
+                'width': [box[2] for _, box in words],
+                'height': [box[3] for _, box in words]}
+    d = workers.image_to_data(img, custom_config)
     # rewriting d to smaller h (only interesting data)
     have = dict((key, []) for key in d.keys())
     n_boxes = len(d['text'])
@@ -29,9 +513,12 @@ def data_from_image(img):
         if int(d['level'][i]) == 5:
             for key in d:
                 have[key].append(d[key][i])
+    for text, x, y, w, h in zip(have['text'], have['left'], have['top'], have['width'], have['height']):
+        glyphs.learn(img[max(y - 1, 0):y + h + 1, max(x - 1, 0):x + w + 1], text)
     return have
 
 
+@_observed
 def available_army(img):
     img = image_adjusting(img)
     have = data_from_image(img)
@@ -41,16 +528,16 @@ def available_army(img):
             (x, y, w, h) = (have['left'][i], have['top'][i], have['width'][i], have['height'][i])
             roi = img[y-1:y + h+1, x + 20:x + w]
             custom_config = r'--oem 3 --psm 7 outputbase digits'
-            army.append(int(pytesseract.image_to_string(roi, config=custom_config)))
+            army.append(int(read_text(roi, custom_config)))
     return army
 
 
+@_observed
 def available_unit(img):
     logging.info('available_unit')
     img = image_adjusting(img)
     img = cut_img_to_available(img)
-    custom_config = r'-c tessedit_char_whitelist="1234567890/ " --psm 7'
-    d = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=custom_config)
+    d = data_from_image(img, r'-c tessedit_char_whitelist="1234567890/ " --psm 7')
     (x, y, w, h) = (d['left'][-1], d['top'][-1], d['width'][-1], d['height'][-1])
     roi = img[y-1:y + h+1, x + 18:x + w]
     logging.info(d['text'])
@@ -73,33 +560,88 @@ def available_unit(img):
     return unit_v1
 
 
+def available_units(imgs):
+    """available units of many counters (as available_unit, BGR numpy arrays). Counters not recognised by glyphs
+    are stacked into one image, read by one tesseract call"""
+    logging.info('available_units: {}'.format(len(imgs)))
+    custom_config = r'-c tessedit_char_whitelist="1234567890/ " --psm 6'
+    cut = [cut_img_to_available(image_adjusting(img[:, :, ::-1])) for img in imgs]
+    texts = [None] * len(cut)
+    keys = [cache.key(img, 'available ' + custom_config) for img in cut]
+    rest = []
+    for i, img in enumerate(cut):
+        texts[i] = cache.get(keys[i])
+        if texts[i] is None:
+            recognised = glyphs.recognise(img)
+            if recognised:
+                texts[i] = recognised[0][-1][0]
+                cache.put(keys[i], texts[i])
+            else:
+                rest.append(i)
+    if rest:
+        gap = 20
+        width = max(cut[i].shape[1] for i in rest)
+        tops = []
+        bands = []
+        for i in rest:
+            band = np.full((cut[i].shape[0] + gap, width, 3), 255, np.uint8)
+            band[gap // 2:gap // 2 + cut[i].shape[0], :cut[i].shape[1]] = cut[i]
+            tops.append(sum(b.shape[0] for b in bands))
+            bands.append(band)
+        d = workers.image_to_data(np.vstack(bands), custom_config)
+        for n, i in enumerate(rest):
+            bottom = tops[n] + bands[n].shape[0]
+            words = [(d['left'][k], d['text'][k]) for k in range(len(d['text']))
+                     if int(d['level'][k]) == 5 and d['text'][k].strip() and tops[n] <= d['top'][k] < bottom]
+            if not words:
+                raise Exception('OCR recognition error: no text in counter {}'.format(i))
+            texts[i] = max(words)[1]
+            cache.put(keys[i], texts[i])
+    result = [int(text.split('/')[-1]) for text in texts]
+    if observers:
+        for img, units in zip(imgs, result):
+            _observe('available_unit', img[:, :, ::-1], units)
+    logging.info('Available units: {}'.format(result))
+    return result
+
+
 def get_border(img):
-    """return pixel number of the border between assigned, and available units"""
+    """return pixel number of the border between assigned, and available units
+    (1 + the rightmost column, but the first and the last, white between rows 5 and height - 5)"""
     height, width, _ = img.shape
-    white_line = np.full(((height - 10), 1, 3), 255)
-    for i in range(width - 1, 1, -1):
-        if np.array_equal(img[5:height - 5, i - 1:i], white_line):
-            return i
+    white = (img[5:height - 5, 1:width - 1] == 255).all(axis=(0, 2))
+    columns = np.flatnonzero(white)
+    if len(columns):
+        return int(columns[-1]) + 2
+
+
+def split_at_border(img):
+    """return (assigned, available) parts of adjusted img, split at its border (one get_border call - callers
+    needing both parts split once instead of calling cut_img_to_assigned and cut_img_to_available)"""
+    border = get_border(img)
+    return img[:, 0:border], img[:, border + 1:]
 
 
 def cut_img_to_assigned(img):
-    return img[:, 0:get_border(img)]
+    return split_at_border(img)[0]
 
 
 def cut_img_to_available(img):
-    return img[:, get_border(img)+1:]
+    return split_at_border(img)[1]
 
 
+@_observed
 def assigned_army(img):
     img = image_adjusting(img)
     have = data_from_image(img)
     return list(int(no) for i, no in enumerate(have['text']) if not i % 2)
 
 
+@_observed
 def assigned_unit(img):
     img = image_adjusting(img)
     custom_config = r'-c tessedit_char_whitelist="1234567890/ " --psm 7'
-    text = pytesseract.image_to_string(img, config=custom_config).split()
+    text = read_text(img, custom_config).split()
     if text[0].isdigit():
         return int(text[0])
     else:
@@ -107,10 +649,11 @@ def assigned_unit(img):
         raise Exception
 
 
+@_observed
 def assigned_unit_sum(img):
     img = image_adjusting(img)
     custom_config = r'-l {} --psm 7'.format(_('lang'))
-    text = pytesseract.image_to_string(img, config=custom_config).split()
+    text = read_text(img, custom_config).split()
     for word in text:
         if word.isdigit():
             logging.info('Units sum: {}'.format(word))
@@ -122,20 +665,3 @@ def assigned_unit_sum(img):
         logging.error('OCR recognition error: No digit in {}'.format(text))
         raise Exception
 
-"""
-t0 = time.time()
-img = cv.imread('test.png',0)
-print(available_army(img))
-print(time.time()-t0)
-t0 = time.time()
-print(assigned_army(img))
-print(time.time()-t0)
-t0 = time.time()
-img = cv.imread('test1.png',0)
-print(assigned_unit(img))
-print(time.time()-t0)
-t0 = time.time()
-img = cv.imread('testSum.png',0)
-print(assigned_unit_sum(img))
-print(time.time()-t0)
-"""
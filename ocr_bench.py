@@ -0,0 +1,228 @@
+"""OCR accuracy and latency benchmark. Corpus is a directory of captures (png, as grabbed from the screen)
+given to ocr reading functions, with labels.json: {"samples": [{"image": "available_unit_1a2b3c4d5e6f.png",
+"function": "available_unit", "expected": 12, "verified": false}, ...]}. Samples are collected from what the
+bot reads - while replaying recorded session (replay.py / recorder.py archives) or from single captures.
+Collected samples are labelled with what the reference backend read and "verified": false, until checked
+(and corrected) by hand.
+Usage:
+    python ocr_bench.py run [backend,backend,...]   # default: all backends
+    python ocr_bench.py seed-session <session dir or archive> <adventure name> [task, default make_adventure]
+    python ocr_bench.py seed-image <png> <function> [expected]
+Backends: tesseract (pytesseract only), workers (ocr.OcrPool, if libtesseract is available), glyphs
+(glyph templates of save/glyphs with tesseract fallback, learning into a temporary copy) and cache
+(everything, read the second time - hits of ocr.OcrCache)."""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import cv2 as cv
+import pytesseract
+import ocr
+from latency import Histogram
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resource', 'ocr_corpus')
+FUNCTIONS = ('available_army', 'assigned_army', 'available_unit', 'assigned_unit', 'assigned_unit_sum')
+BACKENDS = ('tesseract', 'workers', 'glyphs', 'cache')
+
+
+class Corpus:
+    """labelled captures in directory (see module doc)"""
+    def __init__(self, directory=CORPUS):
+        self.directory = directory
+        self.samples = []
+        path = os.path.join(directory, 'labels.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                self.samples = json.load(f)['samples']
+
+    def image(self, sample):
+        """return capture of sample as RGB numpy array (as given by my_pygui.screenshot)"""
+        img = cv.imread(os.path.join(self.directory, sample['image']), cv.IMREAD_COLOR)
+        if img is None:
+            raise OSError('can not read {}'.format(sample['image']))
+        return np.ascontiguousarray(img[:, :, ::-1])
+
+    def add(self, function, img, expected, verified=False):
+        """adds capture (RGB) read by function, if not in corpus yet, return True if added"""
+        img = np.ascontiguousarray(img)
+        name = '{}_{}.png'.format(function, hashlib.blake2b(img.data, digest_size=6).hexdigest())
+        if any(sample['image'] == name for sample in self.samples):
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        cv.imwrite(os.path.join(self.directory, name), img[:, :, ::-1])
+        self.samples.append({'image': name, 'function': function, 'expected': expected, 'verified': verified})
+        return True
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'labels.json'), 'w') as f:
+            json.dump({'samples': self.samples}, f, indent=2)
+
+
+class _Pytesseract:
+    """ocr.workers replacement calling pytesseract (new tesseract process per call)"""
+    @staticmethod
+    def image_to_string(img, config=''):
+        return pytesseract.image_to_string(img, config=config)
+
+    @staticmethod
+    def image_to_data(img, config=''):
+        return pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=config)
+
+
+class _NoGlyphs:
+    @staticmethod
+    def recognise(img):
+        return None
+
+    @staticmethod
+    def learn(img, text, confirmed=False):
+        return False
+
+    @staticmethod
+    def confirm(value):
+        return False
+
+
+@contextlib.contextmanager
+def backend(name):
+    """makes ocr read by backend name, ocr module state is restored afterwards"""
+    saved = ocr.glyphs, ocr.workers, ocr.cache
+    directory = None
+    ocr.cache = ocr.OcrCache(size=0)
+    try:
+        if name == 'tesseract':
+            ocr.glyphs, ocr.workers = _NoGlyphs(), _Pytesseract()
+        elif name == 'workers':
+            ocr.glyphs, ocr.workers = _NoGlyphs(), ocr.OcrPool()
+            if not ocr.workers._ready():
+                raise OSError('libtesseract not available')
+        elif name in ('glyphs', 'cache'):
+            directory = tempfile.mkdtemp(prefix='glyphs_')
+            if os.path.isdir(saved[0].directory):
+                shutil.copytree(saved[0].directory, directory, dirs_exist_ok=True)
+            ocr.glyphs = ocr.Glyphs(directory)
+            if name == 'cache':
+                ocr.cache = ocr.OcrCache()
+        else:
+            raise ValueError('unknown OCR backend {}'.format(name))
+        yield
+    finally:
+        if isinstance(ocr.workers, ocr.OcrPool) and ocr.workers is not saved[1]:
+            ocr.workers.close()
+        ocr.glyphs, ocr.workers, ocr.cache = saved
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _read(function, img):
+    """return (result or None, seconds), image_adjusting memo is cleared, so every call adjusts its capture"""
+    ocr._adjusted.clear()
+    t0 = time.perf_counter()
+    try:
+        result = getattr(ocr, function)(img)
+    except Exception:
+        result = None
+    return result, time.perf_counter() - t0
+
+
+def run(corpus, name):
+    """return {function: accuracy and latency} of backend name on corpus"""
+    images = [corpus.image(sample) for sample in corpus.samples]
+    report = dict()
+    with backend(name):
+        if name == 'cache':
+            for sample, img in zip(corpus.samples, images):
+                _read(sample['function'], img)
+        for sample, img in zip(corpus.samples, images):
+            result, seconds = _read(sample['function'], img)
+            row = report.setdefault(sample['function'], {'samples': 0, 'correct': 0, 'failed': 0,
+                                                         'unverified': 0, 'histogram': Histogram()})
+            row['samples'] += 1
+            row['correct'] += result == sample['expected']
+            row['failed'] += result is None
+            row['unverified'] += not sample.get('verified')
+            row['histogram'].record(seconds)
+    for row in report.values():
+        histogram = row.pop('histogram')
+        row.update(accuracy=round(row['correct'] / row['samples'], 4),
+                   p50=histogram.percentile(50), p95=histogram.percentile(95))
+    return report
+
+
+def compare(corpus, names=BACKENDS):
+    """return {backend: run report}, backends not available here are reported as {'error': reason}"""
+    results = dict()
+    for name in names:
+        try:
+            results[name] = run(corpus, name)
+        except OSError as e:
+            results[name] = {'error': str(e)}
+    return results
+
+
+def print_comparison(results):
+    print('{:10} {:18} {:>7} {:>9} {:>7} {:>10} {:>10}'.format(
+        'backend', 'function', 'samples', 'accuracy', 'failed', 'p50 ms', 'p95 ms'))
+    for name, report in results.items():
+        if 'error' in report:
+            print('{:10} {}'.format(name, report['error']))
+            continue
+        for function in FUNCTIONS:
+            if function in report:
+                row = report[function]
+                print('{:10} {:18} {:7} {:9.1%} {:7} {:10.2f} {:10.2f}'.format(
+                    name, function, row['samples'], row['accuracy'], row['failed'],
+                    row['p50'] * 1000, row['p95'] * 1000))
+
+
+def seed_session(corpus, directory, adventure, task='make_adventure'):
+    """replays session (replay.benchmark) and adds every capture read by ocr to corpus, return number added"""
+    import replay
+    added = []
+
+    def collect(function, img, result):
+        added.append(corpus.add(function, img, result))
+    ocr.observers.append(collect)
+    try:
+        replay.benchmark(directory, adventure, task)
+    finally:
+        ocr.observers.remove(collect)
+    corpus.save()
+    return sum(added)
+
+
+def seed_image(corpus, path, function, expected=None):
+    """adds capture png read by function, labelled by tesseract if expected is not given"""
+    img = cv.imread(path, cv.IMREAD_COLOR)
+    if img is None:
+        raise OSError('can not read {}'.format(path))
+    img = np.ascontiguousarray(img[:, :, ::-1])
+    verified = expected is not None
+    if not verified:
+        with backend('tesseract'):
+            expected, _ = _read(function, img)
+    added = corpus.add(function, img, expected, verified)
+    corpus.save()
+    return added
+
+
+if __name__ == '__main__':
+    corpus = Corpus()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'run'
+    if command == 'run':
+        if not corpus.samples:
+            sys.exit('corpus {} is empty - seed it first (seed-session / seed-image)'.format(corpus.directory))
+        print_comparison(compare(corpus, sys.argv[2].split(',') if len(sys.argv) > 2 else BACKENDS))
+    elif command == 'seed-session':
+        print('{} samples added'.format(seed_session(corpus, *sys.argv[2:5])))
+    elif command == 'seed-image':
+        expected = json.loads(sys.argv[4]) if len(sys.argv) > 4 else None
+        print('added' if seed_image(corpus, sys.argv[2], sys.argv[3], expected) else 'already in corpus')
+    else:
+        sys.exit(__doc__)
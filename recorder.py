@@ -0,0 +1,292 @@
+"""Session recorder - stores what the bot saw and did into one append-only archive per run:
+captured frames (deduplicated by region hash, delta-compressed png chunks), mouse/keyboard input and
+locate results. Archive can be read back (read) or unpacked into replay session directory (extract).
+Usage:
+    recorder.Recorder().start()   # before the task, archive goes to save/sessions/<date-time>.rec
+    python recorder.py <archive> <session dir>   # extract for replay.py"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import cv2 as cv
+import capture
+import my_pygui
+from my_types import Hit
+
+MAGIC = b'SBREC1\n'
+EVENT = 1
+PNG = 2
+_HEADER = struct.Struct('<BI')
+
+
+def _jsonable(value):
+    """return value with Points, Boxes, Hits and numpy types converted to json types"""
+    if isinstance(value, Hit):
+        return {'x': value.x, 'y': value.y, 'label': value.label, 'score': round(value.score, 4)}
+    if hasattr(value, 'w') and hasattr(value, 'x'):
+        return [value.x, value.y, value.w, value.h]
+    if hasattr(value, 'x') and hasattr(value, 'y'):
+        return [value.x, value.y]
+    if isinstance(value, dict):
+        return dict((str(key), _jsonable(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+class _RecordingCapture(capture.CaptureBackend):
+    def __init__(self, recorder, backend):
+        self.recorder = recorder
+        self.backend = backend
+
+    def size(self):
+        return self.backend.size()
+
+    def grab(self, region=None):
+        view = self.backend.grab(region)
+        self.recorder.frame(region, view)
+        return view
+
+    def close(self):
+        self.backend.close()
+
+
+class _RecordingInput:
+    def __init__(self, recorder, backend):
+        self.recorder = recorder
+        self.backend = backend
+
+    def __getattr__(self, name):
+        function = getattr(self.backend, name)
+
+        def recorded(*args, **kwargs):
+            result = function(*args, **kwargs)
+            self.recorder.event('input', action=name, args=args, kwargs=kwargs)
+            return result
+        return recorded
+
+
+class Recorder:
+    """Records session into archive (path, default save/sessions/<date-time>.rec), writing on its own thread.
+    Frames are queued as copies (queue of queue_size, when full frames are dropped, so play is never slowed),
+    hashed, and stored as png of xor with the previous frame of the same region (every keyframe_every-th
+    frame whole). Identical frames are stored as reference only. After max_bytes only events are written."""
+    def __init__(self, path=None, max_bytes=200 * 2 ** 20, keyframe_every=30, queue_size=16, hashes=1024):
+        self.path = path or 'save/sessions/{}.rec'.format(time.strftime('%Y%m%d-%H%M%S'))
+        self.max_bytes = max_bytes
+        self.keyframe_every = keyframe_every
+        self.hashes = hashes
+        self.written = 0
+        self.frames = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.skipped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._file = None
+        self._seen = OrderedDict()
+        self._previous = dict()
+        self._next_id = 0
+
+    def start(self):
+        """hooks into my_pygui capture, input and locate calls and starts the writer thread"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'xb')
+        self._file.write(MAGIC)
+        self.written = len(MAGIC)
+        self._thread = threading.Thread(target=self._write_loop, name='recorder', daemon=True)
+        self._thread.start()
+        my_pygui.frame_cache.set_backend(_RecordingCapture(self, my_pygui.frame_cache.backend), close_previous=False)
+        my_pygui.set_input_backend(_RecordingInput(self, my_pygui.input_backend))
+        my_pygui.observers.append(self._observe)
+        atexit.register(self.stop)
+        logging.info('Recorder: recording to {}'.format(self.path))
+        return self
+
+    def stop(self):
+        """unhooks from my_pygui and waits for the writer to store queued items"""
+        if self._thread is None:
+            return
+        if isinstance(my_pygui.frame_cache.backend, _RecordingCapture):
+            my_pygui.frame_cache.set_backend(my_pygui.frame_cache.backend.backend, close_previous=False)
+        if isinstance(my_pygui.input_backend, _RecordingInput):
+            my_pygui.set_input_backend(my_pygui.input_backend.backend)
+        if self._observe in my_pygui.observers:
+            my_pygui.observers.remove(self._observe)
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        logging.info('Recorder: {}'.format(self.stats()))
+
+    def event(self, kind, **data):
+        self._put((kind, my_pygui.clock.time(), data))
+
+    def frame(self, region, view):
+        # backend buffers are reused - frame has to be copied, before it is queued
+        self._put(('frame', my_pygui.clock.time(), {'region': [int(i) for i in region] if region else None,
+                                                    'image': view.copy()}))
+
+    def _observe(self, kind, data):
+        self._put((kind, my_pygui.clock.time(), data))
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, kind, payload):
+        self._file.write(_HEADER.pack(kind, len(payload)))
+        self._file.write(payload)
+        self.written += _HEADER.size + len(payload)
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind, taken, data = item
+            try:
+                if kind == 'frame':
+                    self._store_frame(taken, data['region'], data['image'])
+                else:
+                    record = dict(_jsonable(data), kind=kind, t=round(taken, 3))
+                    self._write(EVENT, json.dumps(record).encode())
+            except (OSError, ValueError) as e:
+                logging.warning('Recorder: {} not recorded ({})'.format(kind, e))
+        self._file.flush()
+
+    def _store_frame(self, taken, region, image):
+        record = {'kind': 'frame', 't': round(taken, 3), 'region': region,
+                  'shape': list(image.shape)}
+        digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16).digest()
+        if digest in self._seen:
+            self._seen.move_to_end(digest)
+            self.duplicates += 1
+            self._write(EVENT, json.dumps(dict(record, same_as=self._seen[digest])).encode())
+            return
+        if self.written > self.max_bytes:
+            self.skipped += 1
+            self._write(EVENT, json.dumps(dict(record, skipped=True)).encode())
+            return
+        key = tuple(region) if region else None
+        previous = self._previous.get(key)
+        frame_id = self._next_id
+        self._next_id += 1
+        if previous is not None and previous[2] < self.keyframe_every and previous[1].shape == image.shape:
+            payload = np.bitwise_xor(image, previous[1])
+            record.update(delta_of=previous[0])
+            self._previous[key] = (frame_id, image, previous[2] + 1)
+        else:
+            payload = image
+            self._previous[key] = (frame_id, image, 1)
+        ok, png = cv.imencode('.png', payload)
+        if not ok:
+            raise ValueError('png encoding failed')
+        self._write(EVENT, json.dumps(dict(record, id=frame_id)).encode())
+        self._write(PNG, png.tobytes())
+        self._seen[digest] = frame_id
+        while len(self._seen) > self.hashes:
+            self._seen.popitem(last=False)
+        self.frames += 1
+
+    def stats(self):
+        return {'path': self.path,
+                'bytes': self.written,
+                'frames': self.frames,
+                'duplicates': self.duplicates,
+                'dropped': self.dropped,
+                'skipped': self.skipped}
+
+
+def read(path):
+    """yields recorded events (dicts) of archive, frame events with decoded 'image' (if stored)"""
+    frames = dict()
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a session archive'.format(path))
+        pending = None
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            kind, length = _HEADER.unpack(header)
+            payload = f.read(length)
+            if kind == PNG:
+                image = cv.imdecode(np.frombuffer(payload, np.uint8), cv.IMREAD_UNCHANGED)
+                if 'delta_of' in pending:
+                    image = np.bitwise_xor(image, frames[pending['delta_of']])
+                frames[pending['id']] = image
+                pending['image'] = image
+                yield pending
+                pending = None
+                continue
+            if pending is not None:
+                yield pending
+                pending = None
+            event = json.loads(payload.decode())
+            if event['kind'] == 'frame' and 'id' in event:
+                pending = event
+                continue
+            if event['kind'] == 'frame' and 'same_as' in event:
+                event['image'] = frames.get(event['same_as'])
+            yield event
+
+
+def extract(path, directory):
+    """unpacks archive into replay session directory (see replay.Replay): every captured frame (region grabs
+    pasted onto the last whole screen) becomes a step, after the input that preceded it"""
+    os.makedirs(directory, exist_ok=True)
+    steps = []
+    screen = None
+    last_input = None
+    position = [0, 0]
+    start = None
+    for event in read(path):
+        start = event['t'] if start is None else start
+        if event['kind'] == 'input':
+            action, args = event['action'], event['args']
+            if action in ('moveTo', 'click', 'dragTo'):
+                if args:
+                    position = args[0] if isinstance(args[0], list) else args[:2]
+                if action != 'moveTo':
+                    last_input = ['click' if action == 'click' else 'drag', position]
+            elif action == 'hotkey':
+                last_input = [action, list(args)]
+            elif args:
+                last_input = [action, args[0]]
+            continue
+        if event['kind'] != 'frame' or event.get('image') is None:
+            continue
+        image = event['image']
+        if event['region'] is None or screen is None:
+            if event['region'] is not None:
+                continue
+            screen = image.copy()
+        else:
+            x, y, w, h = event['region']
+            screen[y:y + h, x:x + w] = image
+        name = '{:05}.png'.format(len(steps))
+        cv.imwrite(os.path.join(directory, name), screen)
+        steps.append({'frame': name, 'input': last_input, 'time': round(event['t'] - start, 3)})
+        last_input = None
+    with open(os.path.join(directory, 'session.json'), 'w') as f:
+        json.dump({'steps': steps}, f, indent=2)
+    return len(steps)
+
+
+if __name__ == '__main__':
+    print('{} steps extracted'.format(extract(sys.argv[1], sys.argv[2])))
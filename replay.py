@@ -0,0 +1,183 @@
+"""Headless replay of recorded sessions - frames are served from a session directory instead of the screen,
+mouse and keyboard input only advances the replay and my_pygui.clock is virtual (my.wait returns at once).
+Usage (benchmark of Adventure task):
+    python replay.py <session dir> <adventure name> [task, default make_adventure]
+pyautogui and pynput still need X display to be imported - on a headless box run it under xvfb-run."""
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import capture
+import my_pygui
+
+
+class ReplayEnd(BaseException):
+    """Replay has nothing more to show. BaseException, so it is not swallowed by error recovery of main tasks"""
+
+
+class Replay(capture.FileBackend):
+    """Capture and input backend serving recorded session. Session directory holds frames (png) and optional
+    session.json: {"steps": [{"frame": "00001.png", "input": ["click", [x, y]], "time": 12.3}, ...]}
+    - frame of step is shown after its input, or (input null) at its time counted from the previous step.
+    Without session.json every input shows the next png (name order). Recorder archive (recorder.py) can be
+    given instead of the directory - it is unpacked into temporary directory, removed by close() (or at exit).
+    match='input' - input jumps to the next step recorded after the same input (looking lookahead steps ahead,
+    positions within tolerance px), not matched input (or match='step') advances one step.
+    ReplayEnd is raised after idle_grabs captures without any change of the shown frame."""
+    def __init__(self, directory, match='input', lookahead=20, tolerance=3, idle_grabs=2000):
+        self._unpacked = None
+        if os.path.isfile(directory):
+            # recorder archive - unpacked into temporary session directory
+            import recorder
+            self._unpacked = tempfile.TemporaryDirectory(prefix='replay_')
+            archive, directory = directory, self._unpacked.name
+            recorder.extract(archive, directory)
+        manifest = os.path.join(directory, 'session.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                self.steps = json.load(f)['steps']
+        else:
+            self.steps = [{'frame': os.path.basename(path), 'input': None, 'time': None}
+                          for path in sorted(glob.glob(os.path.join(directory, '*.png')))]
+        super().__init__([os.path.join(directory, step['frame']) for step in self.steps])
+        self.match = match
+        self.lookahead = lookahead
+        self.tolerance = tolerance
+        self.idle_grabs = idle_grabs
+        self.inputs = []
+        self.matched = 0
+        self.unmatched = 0
+        self._position = (0, 0)
+        self._shown = my_pygui.clock.time()
+        self._idle = 0
+
+    def close(self):
+        super().close()
+        if self._unpacked is not None:
+            self._unpacked.cleanup()
+            self._unpacked = None
+
+    def install(self):
+        """makes my_pygui capture and input through this replay, on virtual clock"""
+        my_pygui.frame_cache.set_backend(self)
+        my_pygui.set_input_backend(self)
+        my_pygui.clock.virtual = True
+        return self
+
+    def _show(self, index):
+        self.index = max(min(index, len(self.steps) - 1), 0)
+        self._shown = my_pygui.clock.time()
+        self._idle = 0
+
+    def _follow_time(self):
+        """shows steps without input, whose time has come"""
+        while self.index + 1 < len(self.steps):
+            current, following = self.steps[self.index], self.steps[self.index + 1]
+            if following.get('input') is not None or current.get('time') is None or following.get('time') is None:
+                break
+            shown_for = following['time'] - current['time']
+            if my_pygui.clock.time() - self._shown < shown_for:
+                break
+            self.index += 1
+            self._shown += shown_for
+            self._idle = 0
+
+    def _same(self, recorded, taken):
+        if not recorded or recorded[0] != taken[0]:
+            return False
+        first, second = recorded[1], taken[1]
+        if isinstance(first, list) and isinstance(second, list) and len(first) == len(second) \
+                and all(isinstance(i, (int, float)) for i in first + second):
+            return all(abs(a - b) <= self.tolerance for a, b in zip(first, second))
+        return first == second
+
+    def _input(self, action, args):
+        taken = [action, args]
+        self.inputs.append(taken)
+        if self.match == 'input':
+            for index in range(self.index + 1, min(self.index + 1 + self.lookahead, len(self.steps))):
+                if self._same(self.steps[index].get('input'), taken):
+                    self.matched += 1
+                    self._show(index)
+                    return
+        self.unmatched += 1
+        self._show(self.index + 1)
+
+    def _xy(self, args):
+        if args and hasattr(args[0], 'x'):
+            return [int(args[0].x), int(args[0].y)]
+        if args and isinstance(args[0], (tuple, list)):
+            return [int(i) for i in args[0][:2]]
+        if len(args) >= 2 and args[0] is not None:
+            return [int(args[0]), int(args[1])]
+        return list(self._position)
+
+    def grab(self, region=None):
+        self._follow_time()
+        self._idle += 1
+        if self._idle > self.idle_grabs:
+            raise ReplayEnd('replay idle at step {} of {}'.format(self.index, len(self.steps)))
+        return super().grab(region)
+
+    def moveTo(self, *args, **kwargs):
+        self._position = tuple(self._xy(args))
+
+    def click(self, *args, **kwargs):
+        self._position = tuple(self._xy(args))
+        self._input('click', list(self._position))
+
+    def dragTo(self, *args, **kwargs):
+        self._position = tuple(self._xy(args))
+        self._input('drag', list(self._position))
+
+    def write(self, text, *args, **kwargs):
+        self._input('write', text)
+
+    def press(self, keys, *args, **kwargs):
+        self._input('press', keys if isinstance(keys, str) else list(keys))
+
+    def hotkey(self, *keys, **kwargs):
+        self._input('hotkey', list(keys))
+
+    def scroll(self, clicks, *args, **kwargs):
+        self._input('scroll', clicks)
+
+    def stats(self):
+        return {'steps': len(self.steps),
+                'step': self.index,
+                'inputs': len(self.inputs),
+                'matched': self.matched,
+                'unmatched': self.unmatched,
+                'virtual_time': round(my_pygui.clock.offset, 1)}
+
+
+def benchmark(directory, adventure, task='make_adventure', **kwargs):
+    """runs task of main.Adventure on replay of session directory, returns timing and stats"""
+    import main
+    replay = Replay(directory).install()
+    adv = main.Adventure(adventure)
+    t0 = time.time()
+    try:
+        getattr(adv, task)(**kwargs)
+        finished = True
+    except ReplayEnd as e:
+        logging.warning('benchmark: {}'.format(e))
+        finished = False
+    try:
+        return {'task': task,
+                'finished': finished,
+                'wall_time': round(time.time() - t0, 3),
+                'replay': replay.stats(),
+                'frame_cache': my_pygui.frame_cache.stats(),
+                'input_pacing': my_pygui.pacer.report(),
+                'waits': my_pygui.wait_until.stats()}
+    finally:
+        replay.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(benchmark(*sys.argv[1:4]), indent=2))
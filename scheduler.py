@@ -0,0 +1,149 @@
+"""Deadlines of adventure actions. Delay of action (learned.json, taught as time from the end of the previous
+action) becomes absolute deadline on monotonic clock (my_pygui.clock), preparation (selecting general,
+setting army, dragging the map) starts early enough, so the decisive click lands on the deadline."""
+import json
+import logging
+import os
+import my
+import my_pygui
+from tracer import trace
+
+
+class ActionScheduler:
+    """prepare(action) waits until preparation of action has to start, fire() waits (short) rest of time
+    until the decisive click, done() ends action and records its drift (click - deadline).
+    Preparation time is estimated per action (learned from previous runs of it, see load/save), then per action
+    type (learned in this run), default prep seconds for attack/move (only the first general has to be ready
+    for the deadline), margin is added to estimates.
+    Action can be pre-staged (stage callable given to prepare) when the wait before its preparation is at least
+    stage_window seconds long - then only the rest of preparation (estimated separately, default final
+    seconds) is left for the deadline.
+    Only UI work counts as preparation - waits for generals (inside waiting()) are left out, and a measured
+    time is clamped to outlier times the current estimate before smoothing."""
+    def __init__(self, prep=12., final=5., margin=2., smoothing=.5, stage_window=30., outlier=2.):
+        self.prep = prep
+        self.final = final
+        self.margin = margin
+        self.smoothing = smoothing
+        self.stage_window = stage_window
+        self.outlier = outlier
+        self.waited = 0.
+        self.estimates = dict()
+        self.by_type = dict()
+        self.drifts = dict()
+        self.action = None
+        self.deadline = None
+        self.prepared = None
+        self.fired = None
+        self.staged = False
+        self.last_end = None
+
+    def _keys(self, action, staged):
+        """return keys of estimates per action and per action type"""
+        suffix = ' staged' if staged else ''
+        return '{}{}'.format(action['no'], suffix), action['type'] + suffix
+
+    def estimate(self, action, staged=False):
+        key, type_key = self._keys(action, staged)
+        if key in self.estimates:
+            return self.estimates[key] + self.margin
+        if type_key in self.by_type:
+            return self.by_type[type_key] + self.margin
+        if action['type'] in ('attack', 'move') and not action['generals'][0].get('preset'):
+            return (self.final if staged else self.prep) + self.margin
+        return 0.
+
+    def load(self, path):
+        """loads estimates of preparation time per action (json file saved by save)"""
+        if os.path.exists(path):
+            with open(path) as f:
+                self.estimates = json.load(f)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(dict((key, round(seconds, 2)) for key, seconds in sorted(self.estimates.items())), f,
+                      indent=2)
+
+    def plan(self, action):
+        """sets deadline of action, return time (monotonic) its preparation has to start"""
+        now = my_pygui.clock.monotonic()
+        self.action = action
+        self.deadline = (self.last_end if self.last_end is not None else now) + action['delay']
+        self.fired = None
+        self.staged = False
+        return self.deadline - self.estimate(action)
+
+    def begin(self):
+        """preparation of planned action starts now"""
+        self.prepared = my_pygui.clock.monotonic()
+        self.waited = 0.
+
+    def waiting(self):
+        """context manager of a wait (e.g. for generals to become active), not counted as preparation"""
+        return _Waiting(self)
+
+    def prepare(self, action, stage=None):
+        """sets deadline of action and waits until its preparation has to start, return True if action was
+        pre-staged (stage(action) returned True) in the meantime"""
+        start = self.plan(action)
+        now = my_pygui.clock.monotonic()
+        if stage is not None and start - now >= self.stage_window:
+            self.staged = bool(stage(action))
+            if self.staged:
+                start = self.deadline - self.estimate(action, staged=True)
+            now = my_pygui.clock.monotonic()
+        if start > now:
+            my.wait(int(start - now), 'Next action ({})in'.format(action['no']))
+            my_pygui.clock.sleep(start - my_pygui.clock.monotonic())
+        self.begin()
+        return self.staged
+
+    def fire(self):
+        """waits for the deadline before the (first) decisive click of action"""
+        if self.deadline is None or self.fired is not None:
+            return
+        ready = my_pygui.clock.monotonic()
+        took = ready - self.prepared - self.waited
+        for estimates, key in zip((self.estimates, self.by_type), self._keys(self.action, self.staged)):
+            if key in estimates:
+                measured = min(took, self.outlier * max(estimates[key], 1.))
+                estimates[key] += self.smoothing * (measured - estimates[key])
+            else:
+                estimates[key] = took
+        my_pygui.clock.sleep(self.deadline - ready)
+        self.fired = my_pygui.clock.monotonic()
+
+    def done(self):
+        """ends action - the next deadline is counted from now"""
+        self.last_end = my_pygui.clock.monotonic()
+        if self.deadline is None:
+            return
+        drift = (self.fired if self.fired is not None else self.prepared) - self.deadline
+        self.drifts[self.action['no']] = round(drift, 3)
+        trace('Action drift', self.action['no'], round(drift, 3))
+        if drift > 1:
+            logging.warning('action {} late by {:.1f} s'.format(self.action['no'], drift))
+        self.deadline = None
+
+    def reset(self):
+        self.last_end = None
+        self.deadline = None
+
+    def report(self):
+        """return drift (seconds) per action no, with mean and max of absolute drifts"""
+        drifts = list(self.drifts.values())
+        return {'actions': dict(self.drifts),
+                'mean': round(sum(abs(d) for d in drifts) / len(drifts), 3) if drifts else 0.,
+                'max': max((abs(d) for d in drifts), default=0.)}
+
+
+class _Waiting:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def __enter__(self):
+        self.start = my_pygui.clock.monotonic()
+
+    def __exit__(self, *exc):
+        self.scheduler.waited += my_pygui.clock.monotonic() - self.start
+        return False
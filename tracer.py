@@ -0,0 +1,125 @@
+"""Structured, level-gated tracing of hot paths (my_pygui wrappers, my_types). A trace call only stores
+(time, level, name, args) in a ring buffer - arguments are formatted when the records are flushed to
+JSON-lines file (every flush_every seconds, by a daemon thread) or read with records(). Records are echoed
+to console log (logger 'trace') at DEBUG - with logging at INFO (main.py) they cost nothing there.
+Records keep references to arguments, mutable ones are formatted as they are at flush time.
+Micro-benchmark against eager logging: python tracer.py"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+_log = logging.getLogger('trace')
+
+
+class Tracer:
+    """level - records below it are dropped at once, echo - logging level records are also passed (lazily
+    formatted) to logger 'trace' at, if it is enabled for it (console log of my_pygui calls), None - not echoed,
+    path - JSON-lines file the records are flushed to (see open)"""
+    def __init__(self, level=INFO, size=10000, echo=DEBUG):
+        self.level = level
+        self.echo = echo
+        self.path = None
+        self.flush_every = 5.
+        self.flushed = 0
+        self._ring = deque(maxlen=size)
+        self._pending = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+
+    def __call__(self, name, *args, level=INFO):
+        if level < self.level:
+            return
+        record = (time.time(), level, name, args)
+        self._ring.append(record)
+        if self.path:
+            with self._pending_lock:
+                self._pending.append(record)
+        if self.echo is not None and _log.isEnabledFor(self.echo):
+            _log.log(self.echo, '%s: %s', name, _LazyArgs(args))
+
+    def debug(self, name, *args):
+        if DEBUG >= self.level:
+            self(name, *args, level=DEBUG)
+
+    def open(self, path, flush_every=5.):
+        """starts periodic flushing of records to JSON-lines file path (appended)"""
+        self.path = path
+        self.flush_every = flush_every
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name='tracer', daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_every)
+            self.flush()
+
+    def flush(self):
+        """writes records traced since the last flush"""
+        if not self.path:
+            return
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            with open(self.path, 'a') as f:
+                for record in pending:
+                    f.write(json.dumps(_as_dict(record)) + '\n')
+            self.flushed += len(pending)
+
+    def records(self, name=None):
+        """return buffered records (dicts, oldest first), optionally only of given name"""
+        return [_as_dict(record) for record in list(self._ring) if name is None or record[2] == name]
+
+
+class _LazyArgs:
+    def __init__(self, args):
+        self.args = args
+
+    def __str__(self):
+        return ', '.join(str(arg) for arg in self.args)
+
+
+def _as_dict(record):
+    t, level, name, args = record
+    return {'t': round(t, 4), 'level': logging.getLevelName(level), 'name': name,
+            'args': [arg if isinstance(arg, (int, float, str, bool)) or arg is None else repr(arg) for arg in args]}
+
+
+tracer = Tracer()
+trace = tracer
+
+
+def _benchmark(calls=100000):
+    """time per call: eager logging.info(...format(...)) with logging at INFO (as main.py), vs trace call
+    of tracer as module tracer is made (Tracer(), echo included)"""
+    import io
+    from my_types import Point
+    logging.basicConfig(level=INFO, stream=io.StringIO())
+    point, kwargs = (Point(100, 200),), {'clicks': 1}
+    bench = Tracer()
+    results = dict()
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        logging.info('Click: {}, {}'.format(point, kwargs))
+    results['eager logging'] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        bench('Click', point, kwargs)
+    results['trace'] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        bench.debug('Point:get')
+    results['trace below level'] = time.perf_counter() - t0
+    for name, seconds in results.items():
+        print('{:20} {:8.3f} us/call'.format(name, seconds / calls * 1e6))
+
+
+if __name__ == '__main__':
+    _benchmark()